@@ -1,25 +1,150 @@
 import os
 import json
+import time
+import asyncio
+import hashlib
 import configparser
-from google import genai
-from google.genai import types
-from openai import OpenAI
+import threading
+import httpx
 from logger_util import log
+from translation_memory import TranslationMemory, make_scope
+from explanation_cache import ExplanationCache
+from hedging import LatencyTracker
+from translation_pipeline import TranslationJob, run_stages
+from rate_limiter import RateLimiter, RateLimitDropped, RETRYABLE_STATUS, error_status, retry_after, backoff_delay
+from name_matcher import CharacterIndex
+from token_budget import estimate_tokens, split_to_budget
 import path_util
 
 INI_PATH = path_util.INI_PATH
 PROMPT_PATH = path_util.PROMPT_PATH
 
+# Prefix used by every user-facing error string returned instead of a translation
+ERROR_PREFIX = "⚠️"
+
+def is_valid_result(res):
+    """True for a usable translation; empty results and ERROR_PREFIX messages are never cached or recorded"""
+    return bool(res) and not res.startswith(ERROR_PREFIX)
+
+# Returned for a line pushed out of a saturated rate-limit queue; a newer line has replaced it anyway
+RATE_LIMIT_DROPPED_MESSAGE = "⚠️ 요청이 밀려 이전 줄의 번역을 건너뛰었습니다."
+
+# Shared across engines; the database is opened lazily on first lookup
+translation_memory = TranslationMemory(path_util.TM_DB_PATH)
+# Parsed explanation JSON, in its own table of the same database
+explanation_cache = ExplanationCache(path_util.TM_DB_PATH)
+
+# Header of the character table, shared by the full (system prompt) and filtered (per-line) forms
+CHAR_TABLE_HEADER = ["| Original Name (Source) | Korean Name (Output) | Character Context |", "|---|---|---|"]
+# Stands in for the table in the static system prompt when only the relevant rows are sent with each line
+CHAR_TABLE_FILTERED_NOTE = "(Sent with each line: only the characters mentioned in the current line or recent context.)"
+# Recent history turns scanned for names besides the current line
+CHAR_CONTEXT_TURNS = 10
+
+# Older turns are compressed into a rolling story summary once this many tokens have fallen out of the budget
+SUMMARY_BATCH_TOKENS = 600
+# Upper bound on unsummarized turns kept while summaries cannot run (no event loop, repeated failures)
+MAX_SUMMARY_BACKLOG = 40
+# Output allowance of a summary request in the rate limiter's token estimate
+SUMMARY_OUTPUT_TOKENS = 300
+# A failed or throttled summary waits before the next attempt, doubling up to the cap
+SUMMARY_BACKOFF_BASE = 5.0
+SUMMARY_BACKOFF_CAP = 300.0
+HISTORY_SUMMARY_HEADER = "### STORY SO FAR (earlier lines, summarized):\n"
+SUMMARY_PROMPT = (
+    "You keep a running synopsis of a story that is being translated into Korean.\n"
+    "Merge the previous synopsis and the new lines into ONE concise synopsis written in Korean, at most 5 sentences: "
+    "who is present, what happened, and the current situation and mood.\n"
+    "Spell character names exactly as in the Korean translations. Output ONLY the synopsis."
+)
+
+# Provider SDKs are imported by the first engine that needs them (see get_engine)
+genai = None
+types = None
+AsyncOpenAI = None
+
+def _import_genai():
+    global genai, types
+    if genai is None:
+        from google import genai as genai_module
+        from google.genai import types as types_module
+        genai, types = genai_module, types_module
+
+def _import_openai():
+    global AsyncOpenAI
+    if AsyncOpenAI is None:
+        from openai import AsyncOpenAI as async_client
+        AsyncOpenAI = async_client
+
+# One keep-alive connection pool for every async provider client (Gemini, OpenAI, Ollama)
+HTTP_POOL_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=300)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+_async_http_client = None
+
+def get_async_http_client():
+    """Returns the shared httpx.AsyncClient. Connections stay open between translations."""
+    global _async_http_client
+    if _async_http_client is None or _async_http_client.is_closed:
+        _async_http_client = httpx.AsyncClient(limits=HTTP_POOL_LIMITS, timeout=HTTP_TIMEOUT)
+    return _async_http_client
+
+async def close_async_http_client():
+    global _async_http_client
+    if _async_http_client is not None and not _async_http_client.is_closed:
+        await _async_http_client.aclose()
+    _async_http_client = None
+
 class BaseEngine:
+    ENGINE_NAME = "Base"
+    DEFAULT_MODEL = ""
+    # Any URL on the provider host; a request to it opens the pooled TLS connection ahead of time
+    WARMUP_URL = None
+    # Prefix of the per-engine RPM/TPM keys in the INI (e.g. GEMINI_RPM)
+    RATE_LIMIT_PREFIX = ""
+    # Approximate tokenizer of the provider (see token_budget.estimate_tokens)
+    TOKENS_PER_CJK_CHAR = 1.0
+    CHARS_PER_TOKEN = 4.0
+    # Cheap model for history summaries; None uses the model of the latest translation
+    SUMMARY_MODEL = None
+
     def __init__(self):
-        # Stores conversation context (user and assistant turns)
+        # Stores conversation context (user and assistant turns), bounded by HISTORY_TOKEN_BUDGET
         self.history = []
+        # Rolling summary of the turns that no longer fit, and the turns waiting to be merged into it
+        self.history_summary = ""
+        self.summary_backlog = []
+        self.summary_task = None
+        # Consecutive failed summaries and the monotonic time before which no new one starts
+        self.summary_failures = 0
+        self.summary_retry_at = 0.0
+        # Bumped on every history reset so a summary started for the old context is discarded
+        self.history_epoch = 0
+        self.history_budget = 2000
+        self.summary_enabled = "1"
+        self.summary_model = ""
+        self.context_model = self.DEFAULT_MODEL
+        # Translation stages for the active profile (see _build_pipeline)
+        self.pipeline = []
+        self.use_memory = True
+        self.pipeline_metrics = "1"
+        # RPM/TPM scheduler and 429/5xx retry policy (RATE_LIMIT_* settings)
+        self.rate_limiter = RateLimiter(self.ENGINE_NAME)
+        self.max_retries = 3
+        self.max_retry_wait = 30.0
         # In-memory caches for frequently accessed data
         self.char_dict_cache = {}
+        self.dict_version_cache = {}
+        # Per-profile table rows and name index used to send only the relevant dictionary entries
+        self.char_rows_cache = {}
+        self.char_index_cache = {}
         self.explanation_prompt_cache = None
+        self.story_prompt_cache = {}
         self.api_key = ""
         self.dict_enabled = "0"
         self.dict_path = "NONE"
+        self.dict_filter = "1"
+        # Latency of completed upstream calls; drives the automatic hedge delay
+        self.latency = LatencyTracker()
         active_profile = self._get_active_profile_from_ini()
         self.reload_settings(active_profile)
 
@@ -49,14 +174,470 @@ class BaseEngine:
                                               fallback=config.get('Settings', 'CHAR_DICT_ENABLED', fallback='0'))
                 self.dict_path = config.get(profile_name, 'CHAR_DICT_PATH',
                                            fallback=config.get('Settings', 'CHAR_DICT_PATH', fallback='NONE'))
+                self.dict_filter = config.get(profile_name, 'CHAR_DICT_FILTER',
+                                             fallback=config.get('Settings', 'CHAR_DICT_FILTER', fallback='1'))
+                self._configure_translation_memory(config, profile_name)
+                self._configure_history(config, profile_name)
+                self._configure_rate_limit(config, profile_name)
+                self._configure_engine(config, profile_name)
+                self.pipeline_metrics = config.get(profile_name, 'PIPELINE_METRICS',
+                                                  fallback=config.get('Settings', 'PIPELINE_METRICS', fallback='1'))
+                self._build_pipeline()
                 return True
             except: continue
+        self._build_pipeline()
         return False
 
+    def _configure_translation_memory(self, config, profile_name):
+        """Applies TM_* limits from the profile (falling back to global Settings)"""
+        get = lambda key, default: config.get(profile_name, key, fallback=config.get('Settings', key, fallback=default))
+        try:
+            translation_memory.configure(
+                enabled=get('TM_ENABLED', '1') == '1',
+                max_entries=int(get('TM_MAX_ENTRIES', '20000')),
+                max_age_days=int(get('TM_MAX_AGE_DAYS', '30')),
+                fuzzy_enabled=get('TM_FUZZY_ENABLED', '1') == '1',
+                fuzzy_threshold=float(get('TM_FUZZY_THRESHOLD', '0.8')),
+                fuzzy_max_distance=int(get('TM_FUZZY_MAX_DISTANCE', '3'))
+            )
+        except ValueError as e:
+            log(f"[Warning] Invalid translation memory setting: {e}")
+
+    def _configure_history(self, config, profile_name):
+        """Applies HISTORY_* settings from the profile (falling back to global Settings)"""
+        get = lambda key, default: config.get(profile_name, key, fallback=config.get('Settings', key, fallback=default))
+        self.summary_enabled = get('HISTORY_SUMMARY_ENABLED', '1')
+        self.summary_model = get('HISTORY_SUMMARY_MODEL', '')
+        try:
+            self.history_budget = int(get('HISTORY_TOKEN_BUDGET', '2000'))
+        except ValueError as e:
+            log(f"[Warning] Invalid HISTORY_TOKEN_BUDGET: {e}")
+
+    def _configure_rate_limit(self, config, profile_name):
+        """Applies <PREFIX>_RPM / <PREFIX>_TPM and the shared RATE_LIMIT_* retry settings"""
+        get = lambda key, default: config.get(profile_name, key, fallback=config.get('Settings', key, fallback=default))
+        try:
+            self.rate_limiter.configure(
+                rpm=int(get(f'{self.RATE_LIMIT_PREFIX}_RPM', '0')),
+                tpm=int(get(f'{self.RATE_LIMIT_PREFIX}_TPM', '0')),
+                max_queue=int(get('RATE_LIMIT_QUEUE', '4'))
+            )
+            self.max_retries = int(get('RATE_LIMIT_MAX_RETRIES', '3'))
+            self.max_retry_wait = float(get('RATE_LIMIT_MAX_WAIT', '30'))
+        except ValueError as e:
+            log(f"[Warning] Invalid rate limit setting: {e}")
+
+    def _configure_engine(self, config, profile_name):
+        """Provider-specific settings, applied after the shared ones (e.g. LocalEngine's LOCAL_*)"""
+
     def _clear_caches(self):
         """Resets all memory caches when profile or settings change"""
         self.char_dict_cache = {}
+        self.dict_version_cache = {}
+        self.char_rows_cache = {}
+        self.char_index_cache = {}
         self.explanation_prompt_cache = None
+        self.story_prompt_cache = {}
+
+    def _reset_history(self):
+        self.history = []
+        self.history_summary = ""
+        self.summary_backlog = []
+        self.summary_failures = 0
+        self.summary_retry_at = 0.0
+        self.history_epoch += 1
+
+    def _count_tokens(self, text):
+        return estimate_tokens(text, self.TOKENS_PER_CJK_CHAR, self.CHARS_PER_TOKEN)
+
+    def record_history(self, text, res):
+        """
+        Records a turn translated by another engine (hedge winner, final behind a draft)
+        so this engine's conversation context stays aligned. Errors and repeats of the latest turn are skipped.
+        """
+        turn = [{"role": "user", "content": text}, {"role": "assistant", "content": res}]
+        if is_valid_result(res) and self.history[-2:] != turn:
+            self._append_history(text, res)
+
+    def _append_history(self, text, res):
+        """Records a finished turn. Turns that no longer fit the token budget are queued for the rolling summary."""
+        self.history.extend([{"role":"user","content":text}, {"role":"assistant","content":res}])
+        older, self.history = split_to_budget(self.history, self.history_budget, self._count_tokens)
+        if older:
+            self.summary_backlog.extend(older)
+            self._schedule_summary()
+
+    def _schedule_summary(self):
+        """Starts a background summary of the backlog once enough has accumulated. Never blocks translation."""
+        if self.summary_enabled != "1" or self._check_client() is not None:
+            self.summary_backlog = []
+            return
+        if self.summary_task is not None and not self.summary_task.done():
+            return
+        if time.monotonic() < self.summary_retry_at:
+            return
+        # No summary is running here, so trimming cannot race with one
+        del self.summary_backlog[:-MAX_SUMMARY_BACKLOG]
+        if sum(self._count_tokens(e['content']) for e in self.summary_backlog) < SUMMARY_BATCH_TOKENS:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Outside the event loop (e.g. a settings reload thread); the backlog waits for the next turn
+            return
+        self.summary_task = loop.create_task(self._update_summary(self.history_epoch))
+
+    async def _update_summary(self, epoch):
+        batch = list(self.summary_backlog)
+        model_name = self.summary_model or self.SUMMARY_MODEL or self.context_model
+        lines = "\n".join(f"{'Source' if e['role'] == 'user' else 'Korean'}: {e['content']}" for e in batch)
+        request = f"### PREVIOUS SYNOPSIS:\n{self.history_summary or '(none)'}\n\n### NEW LINES:\n{lines}"
+        # Background work: only runs on spare capacity, never queues ahead of (or pushes out) a line
+        if not self.rate_limiter.try_acquire(self._count_tokens(SUMMARY_PROMPT + request) + SUMMARY_OUTPUT_TOKENS):
+            self._defer_summary()
+            return
+        try:
+            summary = ((await self._asummarize(SUMMARY_PROMPT, request, model_name)) or "").strip()
+        except Exception as e:
+            delay = self._defer_summary(retry_after(e))
+            log(f"[History] {self.ENGINE_NAME} summary failed ({model_name}), next attempt in {delay:.0f}s: {e}")
+            if error_status(e) == 429:
+                self.rate_limiter.stats['rate_limited'] += 1
+                self.rate_limiter.pause(delay)
+            return
+        self.summary_failures = 0
+        # History was reset (profile change) while the summary was running
+        if epoch != self.history_epoch or not summary:
+            return
+        self.history_summary = summary
+        del self.summary_backlog[:len(batch)]
+        log(f"[History] {self.ENGINE_NAME}: {len(batch)} older turns folded into the story summary ({model_name}).")
+
+    def _defer_summary(self, hint=None):
+        """Holds back the next summary with exponential backoff (or the provider's Retry-After). Returns the delay."""
+        self.summary_failures += 1
+        delay = min(SUMMARY_BACKOFF_CAP, SUMMARY_BACKOFF_BASE * 2 ** (self.summary_failures - 1))
+        if hint is not None:
+            delay = max(delay, hint)
+        self.summary_retry_at = time.monotonic() + delay
+        return delay
+
+    def _get_memory_scope(self, profile, model_name):
+        """Translation memory scope: entries are only shared within the same profile/engine/model/dictionary"""
+        self._get_character_dict_str(profile)
+        return make_scope(profile, self.ENGINE_NAME, model_name, self.dict_version_cache.get(profile, "none"))
+
+    def _lookup_memory(self, text, scope):
+        cached, kind = translation_memory.find(text, scope)
+        if cached is not None:
+            log(f"[TM] {'Hit' if kind == 'hit' else 'Near hit'} ({self.ENGINE_NAME}): '{text[:30]}...'")
+        return cached
+
+    @staticmethod
+    def _store_memory(text, scope, res):
+        if is_valid_result(res):
+            translation_memory.put(text, scope, res)
+
+    # --- Translation pipeline ---
+    def _build_pipeline(self):
+        """
+        Orders the translation stages for the current profile, outermost first:
+        history update -> translation memory -> metrics -> error messages -> rate limit/retry
+        -> provider (prompt assembly, call, post-filter).
+        Optional stages follow the profile's toggles (TM_ENABLED, PIPELINE_METRICS), never per-engine code.
+        """
+        self.use_memory = translation_memory.enabled
+        stages = [self._history_stage]
+        if self.use_memory:
+            stages.append(self._memory_stage)
+        if self.pipeline_metrics == "1":
+            stages.append(self._metrics_stage)
+        stages.extend([self._error_stage, self._rate_limit_stage, self._provider_stage])
+        self.pipeline = stages
+
+    async def _history_stage(self, job, call_next):
+        """Records valid results, translation memory hits included, in the conversation context"""
+        res = await call_next(job)
+        if job.record_history and is_valid_result(res):
+            self._append_history(job.text, res)
+        return res
+
+    async def _memory_stage(self, job, call_next):
+        """Serves repeated (or OCR-noisy near-duplicate) lines from the translation memory before any network call"""
+        job.scope = self._get_memory_scope(job.profile, job.model_name)
+        cached = self._lookup_memory(job.text, job.scope)
+        if cached is not None:
+            job.source = 'memory'
+            return cached
+        res = await call_next(job)
+        self._store_memory(job.text, job.scope, res)
+        return res
+
+    async def _metrics_stage(self, job, call_next):
+        """Latency of successful provider calls; drives the automatic hedge delay and /stats"""
+        start = time.perf_counter()
+        res = await call_next(job)
+        if is_valid_result(res):
+            self.latency.record(time.perf_counter() - start)
+        return res
+
+    async def _error_stage(self, job, call_next):
+        """Turns exceptions that survived the retries into the user-facing ERROR_PREFIX message"""
+        res = self._check_client()
+        if res is not None:
+            return res
+        try:
+            return await call_next(job)
+        except RateLimitDropped:
+            return RATE_LIMIT_DROPPED_MESSAGE
+        except Exception as e:
+            return self._format_error(e, job.model_name)
+
+    async def _rate_limit_stage(self, job, call_next):
+        """Waits for RPM/TPM capacity, then retries 429/5xx with jittered backoff honoring Retry-After"""
+        tokens = self._estimate_request_tokens(job.text, job.profile)
+        attempt, waited = 0, 0.0
+        while True:
+            await self.rate_limiter.acquire(tokens)
+            try:
+                return await call_next(job)
+            except Exception as e:
+                # Only a stream that has not shown anything yet can be retried
+                delay = None if job.streamed else self._retry_delay(e, attempt, waited)
+                if delay is None:
+                    raise
+            attempt += 1
+            waited += delay
+            await asyncio.sleep(delay)
+
+    async def _provider_stage(self, job, call_next):
+        """Terminal stage: provider adapter call (streamed when the job has a delta callback), then the post-filter"""
+        if job.on_delta is None:
+            raw = await self._acomplete(job.text, job.profile, job.model_name)
+        else:
+            parts = []
+            async for chunk in self._astream_request(job.text, job.profile, job.model_name):
+                parts.append(chunk)
+                job.streamed = True
+                job.on_delta(chunk)
+            raw = "".join(parts)
+        job.source = 'provider'
+        return self._post_filter(job.text, raw)
+
+    def _estimate_request_tokens(self, text, profile):
+        """Input (system prompt, history, summary, line) plus an output about as long as the line"""
+        history = sum(self._count_tokens(e['content']) for e in self.history)
+        return (self._count_tokens(self._get_story_prompt(profile)) + history
+                + self._count_tokens(self.history_summary) + 2 * self._count_tokens(text))
+
+    def _retry_delay(self, e, attempt, waited):
+        """Seconds to wait before retrying a failed call, or None when it should fail now"""
+        status = error_status(e)
+        if status not in RETRYABLE_STATUS or attempt >= self.max_retries:
+            return None
+        delay = backoff_delay(attempt, retry_after(e))
+        if waited + delay > self.max_retry_wait:
+            log(f"[RateLimit] {self.ENGINE_NAME}: HTTP {status}, retry would exceed {self.max_retry_wait:.0f}s. Giving up.")
+            return None
+        self.rate_limiter.stats['retries'] += 1
+        if status == 429:
+            self.rate_limiter.stats['rate_limited'] += 1
+            # Every queued line would hit the same quota, so the whole engine waits
+            self.rate_limiter.pause(delay)
+        log(f"[RateLimit] {self.ENGINE_NAME}: HTTP {status}, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s.")
+        return delay
+
+    async def aget_translation(self, text, profile="Settings", model_name=None, record_history=True):
+        """
+        Translates text through the stage pipeline, awaited on the server's event loop over the shared connection pool.
+        record_history=False is used for draft translations, which must not enter the conversation context.
+        """
+        job = TranslationJob(text, profile, model_name or self.DEFAULT_MODEL, record_history)
+        self.context_model = job.model_name
+        return await run_stages(self.pipeline, job)
+
+    async def astream_translation(self, text, profile="Settings", model_name=None):
+        """
+        Streaming variant of aget_translation, through the same stages.
+        Yields ('delta', chunk) as the provider produces text, then exactly one ('done', final_text).
+        'done' may replace the deltas (translation memory hit, post-filter, error message).
+        """
+        deltas = asyncio.Queue()
+        job = TranslationJob(text, profile, model_name or self.DEFAULT_MODEL, on_delta=deltas.put_nowait)
+        self.context_model = job.model_name
+        task = asyncio.create_task(run_stages(self.pipeline, job))
+        # None marks the end of the deltas once the stage chain has finished
+        task.add_done_callback(lambda _: deltas.put_nowait(None))
+        try:
+            while (chunk := await deltas.get()) is not None:
+                yield 'delta', chunk
+            yield 'done', task.result()
+        finally:
+            # The consumer left early (client disconnected): stop the upstream call
+            task.cancel()
+
+    async def aget_explanation(self, text, model_name=None, low_priority=False):
+        """
+        Explanation JSON for text, from the explanation cache when possible.
+        low_priority (prefetch) only proceeds when the rate limiter has capacity right now; otherwise returns None.
+        """
+        model_name = model_name or self.DEFAULT_MODEL
+        cached = self.find_cached_explanation(text, model_name)
+        if cached is not None:
+            return cached
+        res = self._check_client()
+        if res is not None:
+            return res
+        tokens = self._count_tokens(self._get_explanation_prompt()) + 4 * self._count_tokens(text)
+        if low_priority:
+            if not self.rate_limiter.try_acquire(tokens):
+                return None
+        else:
+            await self.rate_limiter.acquire(tokens)
+        res = await self._aexplain(text, model_name)
+        self.remember_explanation(text, model_name, res)
+        return res
+
+    def _explanation_prompt_version(self):
+        # Editing the prompt file invalidates every cached explanation made with the old one
+        return hashlib.sha1(self._get_explanation_prompt().encode('utf-8')).hexdigest()[:12]
+
+    def find_cached_explanation(self, text, model_name):
+        """Returns a previously parsed explanation for this text/engine/model/prompt, or None"""
+        cached = explanation_cache.get(text, self.ENGINE_NAME, model_name, self._explanation_prompt_version())
+        if cached is not None:
+            log(f"[ExplainCache] Hit ({self.ENGINE_NAME}): '{text[:30]}...'")
+        return cached
+
+    def remember_explanation(self, text, model_name, result):
+        explanation_cache.put(text, self.ENGINE_NAME, model_name, self._explanation_prompt_version(), result)
+
+    async def warm_up(self):
+        """Opens a pooled connection to the provider so the first translation skips DNS/TCP/TLS setup"""
+        if not self.WARMUP_URL or self._check_client() is not None:
+            return
+        try:
+            await get_async_http_client().head(self.WARMUP_URL)
+            log(f"[{self.ENGINE_NAME}] Connection pool warmed up.")
+        except Exception as e:
+            log(f"[{self.ENGINE_NAME}] Warm-up skipped: {e}")
+
+    # --- Provider hooks ---
+    def _check_client(self):
+        """Returns an error string when the engine cannot make requests, otherwise None"""
+        return None
+
+    async def _acomplete(self, text, profile, model_name):
+        """Single async request; returns the raw completion text"""
+        raise NotImplementedError
+
+    async def _astream_request(self, text, profile, model_name):
+        """Async streaming request (async generator); yields raw completion text chunks"""
+        raise NotImplementedError
+
+    async def _asummarize(self, system, text, model_name):
+        """Plain single-turn async request used for history summaries; returns the completion text"""
+        raise NotImplementedError
+
+    async def _aexplain(self, text, model_name):
+        """Single async word-analysis request; returns the parsed explanation JSON (dict)"""
+        raise NotImplementedError
+
+    def _post_filter(self, text, raw):
+        """Cleans the completed text; refusals come back as ERROR_PREFIX messages. Returns the final string."""
+        raise NotImplementedError
+
+    def _format_error(self, e, model_name):
+        """Logs a failed call and returns the user-facing ERROR_PREFIX message for it"""
+        raise NotImplementedError
+
+    def _get_story_prompt(self, profile):
+        """
+        System prompt (rules + character table) built once per profile/dictionary version.
+        Kept byte-identical between calls so providers can reuse the cached prefix.
+        """
+        if profile not in self.story_prompt_cache:
+            dict_str = self._get_character_dict_str(profile)
+            if dict_str and self.dict_filter == "1":
+                # Relevant rows travel with each line instead, keeping this prompt static
+                dict_str = CHAR_TABLE_FILTERED_NOTE
+            self.story_prompt_cache[profile] = self._compose_story_prompt(dict_str)
+        return self.story_prompt_cache[profile]
+
+    def _assemble_messages(self, text, profile, model_name):
+        """
+        Shared prompt assembly: static system prompt, budgeted history, per-line notes, then the line.
+        The static prefix stays byte-identical between calls so providers can reuse their prompt caches.
+        """
+        log(f"[{self.ENGINE_NAME}] Requesting: {model_name} | Profile: {profile} | {self._history_log()}")
+        messages = [{"role": "system", "content": self._get_story_prompt(profile)}]
+        messages.extend(self.history)
+        # Summary and relevant dictionary rows sit after the cached prefix, right before the line
+        messages.extend({"role": "system", "content": note} for note in self._get_context_notes(profile, text))
+        messages.append({"role": "user", "content": text})
+        return messages
+
+    def _get_context_notes(self, profile, text):
+        """Per-line reference blocks sent right before the line: the story summary, then the relevant dictionary rows"""
+        notes = []
+        if self.history_summary:
+            notes.append(HISTORY_SUMMARY_HEADER + self.history_summary)
+        char_ref = self._get_character_reference(profile, text)
+        if char_ref:
+            notes.append(char_ref)
+        return notes
+
+    def _history_log(self):
+        tokens = sum(self._count_tokens(e['content']) for e in self.history)
+        return f"History: {len(self.history)} turns (~{tokens}/{self.history_budget} tokens){' + summary' if self.history_summary else ''}"
+
+    def _get_character_reference(self, profile, text):
+        """
+        Character table rows for the names mentioned in the current line or the recent source lines.
+        Returns "" when filtering is off (the full table is in the system prompt) or nothing matches.
+        """
+        if self.dict_filter != "1" or not self._get_character_dict_str(profile):
+            return ""
+        index = self.char_index_cache.get(profile)
+        if index is None:
+            return ""
+        recent = [e['content'] for e in self.history[-CHAR_CONTEXT_TURNS:] if e['role'] == 'user']
+        matched = index.match([text] + recent)
+        if not matched:
+            return ""
+        rows = self.char_rows_cache[profile]
+        log(f"[Dict] {len(matched)}/{len(rows)} characters relevant to this line.")
+        return "### CHARACTER REFERENCE TABLE:\n" + "\n".join(CHAR_TABLE_HEADER + [rows[i] for i in matched])
+
+    def _compose_story_prompt(self, dict_str):
+        # Dynamic system prompt selection based on dictionary availability
+        if dict_str:
+            return (
+                "You are a professional story translator. Translate the text into natural Korean.\n\n"
+                "### RULES:\n"
+                "1. **TRANSLATE EVERYTHING**: Do not skip, summarize, or omit any part. Translate narrative and dialogue fully.\n"
+                "2. Output ONLY the Korean translation. NO introduction, NO explanation, NO conversational filler.\n"
+                "3. **NAME TAG FORMAT (STRICT)**: Apply the 'Name:' format ONLY when a character name is explicitly written in brackets (e.g., [Name], 『Name』, or 「Name」) at the very start of the source line. \n"
+                "4. **NO INFERRED NAMES**: If a line of dialogue does not have a name explicitly attached to it in the source text, DO NOT add, guess, or infer a name tag. Translate it as a simple quote.\n\n"
+                "### RULES for NAMES:\n"
+                "1. **STRICT VERBATIM NAMES**: Use the name exactly as it is used in the source text. If only a given name is used, use only the given name. If only a surname is used, use only the surname. **NEVER expand to a full name unless it is written as a full name in the source.**\n"
+                "2. **DICTIONARY AS SPELLING REFERENCE ONLY**: Use the provided character dictionary only to find the correct Korean spelling for the specific name mentioned. Do not use other parts of the dictionary entry that are not in the source.\n"
+                "3. **PRESERVE HONORIFICS**: If the source includes honorifics (like -san, -kun, -sama), translate them naturally into Korean (씨, 군, 님 등).\n"
+                "4. **NEVER ADD NAMES**: It is a critical failure to add a character name (e.g., '하루코:') if it is not present in the original text. Keep the original structure perfectly.\n\n"
+                "5. Do not infer or add any information about the characters that is not explicitly present in the current input text.\n\n"
+                "### CHARACTER REFERENCE TABLE:\n"
+                f"{dict_str}"
+            )
+        else:
+            return (
+                "You are a professional story translator specializing in creative media.\n"
+                "Translate the provided text into natural, immersive Korean.\n\n"
+                "### RULES:\n"
+                "1. **TRANSLATE ALL TEXT**: Do not skip or omit any part of the input. Every sentence, including descriptions and narrative, must be fully translated.\n"
+                "2. Output ONLY the Korean translation. NO intro/outro.\n"
+                "3. **NAME TAG FORMAT**: If the source text starts with a name in brackets, format it as 'Name:' followed by the dialogue.\n"
+                "4. Maintain the original tone and emotional nuance of the story."
+            )
 
     def _get_explanation_prompt(self):
         """Loads system instruction for word analysis from the prompt file"""
@@ -79,24 +660,53 @@ class BaseEngine:
             return self.char_dict_cache[profile_name]
 
         res_str = ""
+        dict_version = "none"
         if self.dict_enabled == "1" and os.path.exists(self.dict_path):
             try:
-                with open(self.dict_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                with open(self.dict_path, 'rb') as f:
+                    raw = f.read()
+                data = json.loads(raw.decode('utf-8'))
+                # Content hash so edited dictionaries never reuse translations made with the old names
+                dict_version = hashlib.sha1(raw).hexdigest()[:12]
                 # Formats JSON data into a Markdown table for better LLM comprehension
-                rows = ["| Original Name (Source) | Korean Name (Output) | Character Context |", "|---|---|---|"]
-                for char in data:
-                    rows.append(f"| {char.get('name','')} | {char.get('korean_name','')} | {char.get('description','')} |")
-                res_str = "\n".join(rows)
+                rows = [f"| {char.get('name','')} | {char.get('korean_name','')} | {char.get('description', char.get('info',''))} |"
+                        for char in data]
+                res_str = "\n".join(CHAR_TABLE_HEADER + rows)
+                self.char_rows_cache[profile_name] = rows
+                self.char_index_cache[profile_name] = CharacterIndex([char.get('name','') for char in data])
                 log(f"[Dict] Profile '{profile_name}': {len(data)} characters loaded.")
             except Exception as e:
                 log(f"[Error] Dictionary JSON load failed: {e}")
 
         self.char_dict_cache[profile_name] = res_str
+        self.dict_version_cache[profile_name] = dict_version
         return res_str
 
 class GeminiEngine(BaseEngine):
+    ENGINE_NAME = "Gemini"
+    DEFAULT_MODEL = "gemini-2.5-flash-lite"
+    WARMUP_URL = "https://generativelanguage.googleapis.com/"
+    RATE_LIMIT_PREFIX = "GEMINI"
+    TOKENS_PER_CJK_CHAR = 0.7
+    SUMMARY_MODEL = "gemini-2.5-flash-lite"
+    # Explicit context caches are only accepted above a minimum token count; shorter prompts
+    # still benefit from Gemini's implicit prefix caching because the prompt is byte-identical.
+    CONTEXT_CACHE_MIN_CHARS = 4000
+    CONTEXT_CACHE_TTL = 3600
+
     def __init__(self):
+        _import_genai()
+        # Disable all safety settings to prevent blocking of adult game dialogue.
+        self.safety_settings = [
+            types.SafetySetting(category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="BLOCK_NONE"),
+            types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH", threshold="BLOCK_NONE"),
+            types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="BLOCK_NONE"),
+            types.SafetySetting(category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="BLOCK_NONE"),
+        ]
+        # (model, prompt hash) -> (cache name, expiry timestamp); None marks prompts the API refused to cache
+        self.context_caches = {}
+        # (client, cache name) pairs replaced by a newer cache; deleted on the event loop (see _delete_retired_caches)
+        self.retired_caches = []
         super().__init__()
 
     def reload_settings(self, profile_name=None):
@@ -107,112 +717,196 @@ class GeminiEngine(BaseEngine):
         log(f"[Gemini] Settings reloaded for profile: {profile_name}")
         self._clear_caches()
         self._load_ini_settings(profile_name, 'GEMINI_API_KEY')
+        # Caches belong to the previous client/profile; they are deleted with the client that created them
+        self._retire_context_caches([entry[0] for entry in self.context_caches.values() if entry is not None])
+        self.context_caches = {}
         self.client = self._setup_client()
-        self.history = []
+        self._reset_history()
 
     def _setup_client(self):
         if self.api_key:
-            return genai.Client(api_key=self.api_key)
+            # Async calls (client.aio) go through the shared keep-alive pool
+            return genai.Client(api_key=self.api_key,
+                                http_options=types.HttpOptions(httpx_async_client=get_async_http_client()))
         else:
             log("[Warning] Gemini Client failed: API Key missing in Settings.")
             return None
 
-    def get_explanation(self, text, model_name="gemini-2.5-flash-lite"):
-        """Requests structured word analysis in JSON format"""
-        if not self.client: return "⚠️ GEMINI_API_KEY missing."
-
-        log(f"[Gemini] Word Explanation request: '{text[:30]}...' (Model: {model_name})")
-        response = self.client.models.generate_content(
-            model=model_name,
-            contents=text,
-            config=types.GenerateContentConfig(
-                system_instruction=self._get_explanation_prompt(),
-                response_mime_type="application/json",
-                #thinking_config=types.ThinkingConfig(
-                #    thinking_level="low"
-                #)
-            )
+    def _explanation_config(self):
+        return types.GenerateContentConfig(
+            system_instruction=self._get_explanation_prompt(),
+            response_mime_type="application/json",
+            #thinking_config=types.ThinkingConfig(
+            #    thinking_level="low"
+            #)
         )
 
+    async def _aexplain(self, text, model_name):
+        log(f"[Gemini] Word Explanation request: '{text[:30]}...' (Model: {model_name})")
+        response = await self.client.aio.models.generate_content(model=model_name, contents=text, config=self._explanation_config())
         return json.loads(response.text)
 
-    def get_translation(self, text, profile="Settings", model_name="gemini-2.5-flash-lite"):
-        """Story-optimized translation using character context and dialogue history"""
+    async def _asummarize(self, system, text, model_name):
+        config = types.GenerateContentConfig(system_instruction=system, safety_settings=self.safety_settings)
+        response = await self.client.aio.models.generate_content(model=model_name, contents=text, config=config)
+        return response.text
+
+    def _check_client(self):
         if not self.client: return "⚠️ GEMINI_API_KEY가 설정되지 않았습니다! Gateway의 Global Settings에서 키를 먼저 입력해 주세요!"
-        current_dict_str = self._get_character_dict_str(profile)
+        return None
 
-        # Dynamic system prompt selection based on dictionary availability
-        if current_dict_str:
-            story_prompt = (
-                "You are a professional story translator. Translate the text into natural Korean.\n\n"
-                "### RULES:\n"
-                "1. **TRANSLATE EVERYTHING**: Do not skip, summarize, or omit any part. Translate narrative and dialogue fully.\n"
-                "2. Output ONLY the Korean translation. NO introduction, NO explanation, NO conversational filler.\n"
-                "3. **NAME TAG FORMAT (STRICT)**: Apply the 'Name:' format ONLY when a character name is explicitly written in brackets (e.g., [Name], 『Name』, or 「Name」) at the very start of the source line. \n"
-                "4. **NO INFERRED NAMES**: If a line of dialogue does not have a name explicitly attached to it in the source text, DO NOT add, guess, or infer a name tag. Translate it as a simple quote.\n\n"
-                "### RULES for NAMES:\n"
-                "1. **STRICT VERBATIM NAMES**: Use the name exactly as it is used in the source text. If only a given name is used, use only the given name. If only a surname is used, use only the surname. **NEVER expand to a full name unless it is written as a full name in the source.**\n"
-                "2. **DICTIONARY AS SPELLING REFERENCE ONLY**: Use the provided character dictionary only to find the correct Korean spelling for the specific name mentioned. Do not use other parts of the dictionary entry that are not in the source.\n"
-                "3. **PRESERVE HONORIFICS**: If the source includes honorifics (like -san, -kun, -sama), translate them naturally into Korean (씨, 군, 님 등).\n"
-                "4. **NEVER ADD NAMES**: It is a critical failure to add a character name (e.g., '하루코:') if it is not present in the original text. Keep the original structure perfectly.\n\n"
-                "5. Do not infer or add any information about the characters that is not explicitly present in the current input text.\n\n"
-                "### CHARACTER REFERENCE TABLE:\n"
-                f"{current_dict_str}"
-            )
-        else:
-            story_prompt = (
-                "You are a professional story translator specializing in creative media.\n"
-                "Translate the provided text into natural, immersive Korean.\n\n"
-                "### RULES:\n"
-                "1. **TRANSLATE ALL TEXT**: Do not skip or omit any part of the input. Every sentence, including descriptions and narrative, must be fully translated.\n"
-                "2. Output ONLY the Korean translation. NO intro/outro.\n"
-                "3. **NAME TAG FORMAT**: If the source text starts with a name in brackets, format it as 'Name:' followed by the dialogue.\n"
-                "4. Maintain the original tone and emotional nuance of the story."
-            )
+    def _build_request(self, text, profile, model_name, cache_name=None):
+        """Converts the shared message list into Gemini contents"""
+        messages = self._assemble_messages(text, profile, model_name)
+        contents, notes = [], []
+        for m in messages[1:]:
+            if m['role'] == 'system':
+                # Per-line notes become extra parts of the user turn that follows them
+                notes.append(types.Part(text=m['content']))
+                continue
+            role = "model" if m['role'] == "assistant" else "user"
+            contents.append(types.Content(role=role, parts=notes + [types.Part(text=m['content'])]))
+            notes = []
+        config = types.GenerateContentConfig(
+            # The system prompt lives in the context cache when one is available
+            system_instruction=None if cache_name else messages[0]['content'],
+            cached_content=cache_name,
+            safety_settings=self.safety_settings
+        )
+        return contents, config
 
+    def _context_cache_slot(self, profile, model_name):
+        """Returns (key, prompt, cached name or None, needs_create) for the profile's system prompt"""
+        prompt = self._get_story_prompt(profile)
+        key = (model_name, hashlib.sha1(prompt.encode('utf-8')).hexdigest())
+        if len(prompt) < self.CONTEXT_CACHE_MIN_CHARS:
+            return key, prompt, None, False
+        if key in self.context_caches:
+            entry = self.context_caches[key]
+            if entry is None:
+                return key, prompt, None, False
+            name, expires = entry
+            # Renew a minute early so an in-flight request never references an expired cache
+            if time.time() < expires - 60:
+                return key, prompt, name, False
+        return key, prompt, None, True
+
+    def _context_cache_config(self, prompt):
+        return types.CreateCachedContentConfig(
+            system_instruction=prompt,
+            display_name="ko_trans_story_prompt",
+            ttl=f"{self.CONTEXT_CACHE_TTL}s"
+        )
+
+    def _remember_context_cache(self, key, cache):
+        previous = self.context_caches.get(key)
+        if previous is not None and (cache is None or previous[0] != cache.name):
+            self._retire_context_caches([previous[0]])
+        if cache is None:
+            # Rejected (usually below the model's minimum cacheable size): plain requests from now on
+            self.context_caches[key] = None
+            return None
+        self.context_caches[key] = (cache.name, time.time() + self.CONTEXT_CACHE_TTL)
+        log(f"[Gemini] Context cache created for the story prompt: {cache.name}")
+        return cache.name
+
+    async def _aget_context_cache(self, profile, model_name):
+        key, prompt, name, needs_create = self._context_cache_slot(profile, model_name)
+        if not needs_create:
+            return name
+        # Creating the cache is an extra request; without spare capacity this call sends the prompt inline instead
+        if not self.rate_limiter.try_acquire(self._count_tokens(prompt)):
+            return None
         try:
-            # Limits context window to the last 10 turns to balance performance and relevancy
-            history_len = len(self.history[-10:])
-            log(f"[Gemini] Requesting: {model_name} | Profile: {profile} | History context: {history_len} turns")
-
-            contents = [types.Content(role="model" if e['role']=="assistant" else e['role'], parts=[types.Part(text=e['content'])]) for e in self.history[-10:]]
-            contents.append(types.Content(role="user", parts=[types.Part(text=text)]))
-            response = self.client.models.generate_content(
-                model=model_name or "gemini-2.5-flash-lite",
-                contents=contents,
-                config=types.GenerateContentConfig(
-                    system_instruction=story_prompt,
-                    # Disable all safety settings to prevent blocking of adult game dialogue.
-                    safety_settings=[
-                        types.SafetySetting(category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="BLOCK_NONE"),
-                        types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH", threshold="BLOCK_NONE"),
-                        types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="BLOCK_NONE"),
-                        types.SafetySetting(category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="BLOCK_NONE"),
-                    ]
-                )
-            )
+            cache = await self.client.aio.caches.create(model=model_name, config=self._context_cache_config(prompt))
+        except Exception as e:
+            log(f"[Gemini] Context cache unavailable, sending the prompt inline: {e}")
+            cache = None
+        name = self._remember_context_cache(key, cache)
+        await self._delete_retired_caches()
+        return name
 
-            # Prevents cases where the response is blocked and text returns as None.
-            if response.text:
-                res = response.text.strip()
+    def _retire_context_caches(self, names):
+        """Queues replaced caches for deletion; left alone they would linger (and be billed) until their TTL"""
+        self.retired_caches.extend((self.client, name) for name in names)
 
-                if res.startswith("ThisTheR") or res.startswith("ThisTheS") or "ThisThe" in res:
-                    log(f"[Warning] Gemini safety rejection code detected. Not adding to history.")
-                    return "⚠️ [검열됨] 부적절한 콘텐츠로 인해 번역이 차단되었습니다."
+    async def _delete_retired_caches(self):
+        retired, self.retired_caches = self.retired_caches, []
+        for client, name in retired:
+            try:
+                await client.aio.caches.delete(name=name)
+                log(f"[Gemini] Deleted replaced context cache: {name}")
+            except Exception as e:
+                log(f"[Gemini] Could not delete context cache {name}: {e}")
 
-                self.history.extend([{"role":"user","content":text}, {"role":"assistant","content":res}])
-                if len(self.history) > 20: self.history = self.history[-20:]
-                return res
-            else:
-                log("[Warning] Gemini response blocked completely. Not adding to history.")
-                return "⚠️ 번역 실패: 제미나이 정책에 의해 응답이 차단되었습니다."
+    async def warm_up(self):
+        # A reload retires the previous profile's caches; delete them right away instead of at the next cache creation
+        await self._delete_retired_caches()
+        await super().warm_up()
 
+    def _drop_context_cache(self, cache_name):
+        """Forgets a cache the API no longer accepts (deleted or expired early); the next call recreates it"""
+        for key, entry in list(self.context_caches.items()):
+            if entry is not None and entry[0] == cache_name:
+                del self.context_caches[key]
+
+    async def _acomplete(self, text, profile, model_name):
+        cache_name = await self._aget_context_cache(profile, model_name)
+        contents, config = self._build_request(text, profile, model_name, cache_name)
+        try:
+            response = await self.client.aio.models.generate_content(model=model_name, contents=contents, config=config)
+        except Exception as e:
+            if not cache_name or 'cache' not in str(e).lower():
+                raise
+            self._drop_context_cache(cache_name)
+            contents, config = self._build_request(text, profile, model_name)
+            response = await self.client.aio.models.generate_content(model=model_name, contents=contents, config=config)
+        return response.text
+
+    async def _astream_request(self, text, profile, model_name):
+        cache_name = await self._aget_context_cache(profile, model_name)
+        contents, config = self._build_request(text, profile, model_name, cache_name)
+        try:
+            stream = await self.client.aio.models.generate_content_stream(model=model_name, contents=contents, config=config)
         except Exception as e:
-            log(f"[Error] Gemini Translation Exception: {e}")
-            return f"⚠️ Gemini Error: {str(e)}"
+            if not cache_name or 'cache' not in str(e).lower():
+                raise
+            self._drop_context_cache(cache_name)
+            contents, config = self._build_request(text, profile, model_name)
+            stream = await self.client.aio.models.generate_content_stream(model=model_name, contents=contents, config=config)
+        async for chunk in stream:
+            # Blocked or empty chunks carry no text
+            if chunk.text:
+                yield chunk.text
+
+    def _post_filter(self, text, raw):
+        # Prevents cases where the response is blocked and text returns as None.
+        if raw:
+            res = raw.strip()
+
+            if res.startswith("ThisTheR") or res.startswith("ThisTheS") or "ThisThe" in res:
+                log(f"[Warning] Gemini safety rejection code detected. Not adding to history.")
+                return "⚠️ [검열됨] 부적절한 콘텐츠로 인해 번역이 차단되었습니다."
+
+            return res
+        else:
+            log("[Warning] Gemini response blocked completely. Not adding to history.")
+            return "⚠️ 번역 실패: 제미나이 정책에 의해 응답이 차단되었습니다."
+
+    def _format_error(self, e, model_name):
+        log(f"[Error] Gemini Translation Exception: {e}")
+        return f"⚠️ Gemini Error: {str(e)}"
 
 class ChatGPTEngine(BaseEngine):
+    ENGINE_NAME = "ChatGPT"
+    DEFAULT_MODEL = "gpt-4.1-nano"
+    WARMUP_URL = "https://api.openai.com/v1"
+    RATE_LIMIT_PREFIX = "GPT"
+    TOKENS_PER_CJK_CHAR = 0.8
+    SUMMARY_MODEL = "gpt-4.1-nano"
+
     def __init__(self):
+        _import_openai()
         super().__init__()
 
     def reload_settings(self, profile_name=None):
@@ -223,20 +917,18 @@ class ChatGPTEngine(BaseEngine):
         self._clear_caches()
         self._load_ini_settings(profile_name, 'OPENAI_API_KEY')
         self.client = self._setup_client()
-        self.history = []
+        self._reset_history()
 
     def _setup_client(self):
         if self.api_key:
-            return OpenAI(api_key=self.api_key)
+            # SDK retries are off: the engine's rate-limit stage owns retries and backoff
+            return AsyncOpenAI(api_key=self.api_key, http_client=get_async_http_client(), max_retries=0)
         else:
             log("[Warning] ChatGPT Client failed: API Key missing in Settings.")
             return None
 
-    def get_explanation(self, text, model_name="gpt-4.1-nano"):
-        if not self.client: return "⚠️ OPENAI_API_KEY가 설정되지 않았습니다! Gateway의 Global Settings에서 키를 먼저 입력해 주세요!"
-
-        log(f"[ChatGPT] Word Explanation request: '{text[:30]}...' (Model: {model_name})")
-        response = self.client.chat.completions.create(
+    def _explanation_request(self, text, model_name):
+        return dict(
             model=model_name,
             messages=[
                 {"role": "system", "content": self._get_explanation_prompt()},
@@ -245,71 +937,89 @@ class ChatGPTEngine(BaseEngine):
             response_format={"type": "json_object"}
         )
 
+    async def _aexplain(self, text, model_name):
+        log(f"[ChatGPT] Word Explanation request: '{text[:30]}...' (Model: {model_name})")
+        response = await self.client.chat.completions.create(**self._explanation_request(text, model_name))
         return json.loads(response.choices[0].message.content)
 
-    def get_translation(self, text, profile="Settings", model_name="gpt-4.1-nano"):
+    async def _asummarize(self, system, text, model_name):
+        response = await self.client.chat.completions.create(
+            model=model_name,
+            messages=[{"role": "system", "content": system}, {"role": "user", "content": text}]
+        )
+        return response.choices[0].message.content
+
+    def _check_client(self):
         if not self.client:
             return "⚠️ OPENAI_API_KEY가 설정되지 않았습니다! Global Settings에서 키를 입력해 주세요."
+        return None
 
-        dict_str = self._get_character_dict_str(profile)
-        if dict_str:
-            system_content = (
-                "You are a professional story translator. Translate the text into natural Korean.\n\n"
-                "### RULES:\n"
-                "1. **TRANSLATE EVERYTHING**: Do not skip, summarize, or omit any part. Translate narrative and dialogue fully.\n"
-                "2. Output ONLY the Korean translation. NO introduction, NO explanation, NO conversational filler.\n"
-                "3. **NAME TAG FORMAT (STRICT)**: Apply the 'Name:' format ONLY when a character name is explicitly written in brackets (e.g., [Name], 『Name』, or 「Name」) at the very start of the source line. \n"
-                "4. **NO INFERRED NAMES**: If a line of dialogue does not have a name explicitly attached to it in the source text, DO NOT add, guess, or infer a name tag. Translate it as a simple quote.\n\n"
-                "### RULES for NAMES:\n"
-                "1. **STRICT VERBATIM NAMES**: Use the name exactly as it is used in the source text. If only a given name is used, use only the given name. If only a surname is used, use only the surname. **NEVER expand to a full name unless it is written as a full name in the source.**\n"
-                "2. **DICTIONARY AS SPELLING REFERENCE ONLY**: Use the provided character dictionary only to find the correct Korean spelling for the specific name mentioned. Do not use other parts of the dictionary entry that are not in the source.\n"
-                "3. **PRESERVE HONORIFICS**: If the source includes honorifics (like -san, -kun, -sama), translate them naturally into Korean (씨, 군, 님 등).\n"
-                "4. **NEVER ADD NAMES**: It is a critical failure to add a character name (e.g., '하루코:') if it is not present in the original text. Keep the original structure perfectly.\n\n"
-                "5. Do not infer or add any information about the characters that is not explicitly present in the current input text.\n\n"
-                "### CHARACTER REFERENCE TABLE:\n"
-                f"{dict_str}"
-            )
-        else:
-            system_content = (
-                "You are a professional story translator specializing in creative media.\n"
-                "Translate the provided text into natural, immersive Korean.\n\n"
-                "### RULES:\n"
-                "1. **TRANSLATE ALL TEXT**: Do not skip or omit any part of the input. Every sentence, including descriptions and narrative, must be fully translated.\n"
-                "2. Output ONLY the Korean translation. NO intro/outro.\n"
-                "3. **NAME TAG FORMAT**: If the source text starts with a name in brackets, format it as 'Name:' followed by the dialogue.\n"
-                "4. Maintain the original tone and emotional nuance of the story."
-            )
+    def _build_request(self, text, profile, model_name):
+        # OpenAI caches the byte-identical system prompt prefix automatically
+        return {
+            "model": model_name,
+            "messages": self._assemble_messages(text, profile, model_name),
+            # Routes requests with the same prefix to the same cache
+            "prompt_cache_key": f"ko_trans:{profile}:{self.dict_version_cache.get(profile, 'none')}"
+        }
 
-        try:
-            history_len = len(self.history[-10:])
-            log(f"[ChatGPT] Requesting: {model_name} | Profile: {profile} | History turns: {history_len}")
+    async def _acomplete(self, text, profile, model_name):
+        response = await self.client.chat.completions.create(**self._build_request(text, profile, model_name))
+        return response.choices[0].message.content
 
-            messages = [{"role": "system", "content": system_content}]
-            messages.extend(self.history[-10:])
-            messages.append({"role": "user", "content": text})
+    async def _astream_request(self, text, profile, model_name):
+        request = self._build_request(text, profile, model_name)
+        async for chunk in await self.client.chat.completions.create(**request, stream=True):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
-            response = self.client.chat.completions.create(model=model_name or "gpt-4.1-nano", messages=messages)
-            res = response.choices[0].message.content.strip()
+    def _post_filter(self, text, raw):
+        res = raw.strip()
 
-            refusal_keywords = ["I'm sorry", "I cannot fulfill", "I am unable to", "policy", "not translate"]
-            if any(kw in res for kw in refusal_keywords):
-                log(f"[Warning] ChatGPT refusal detected: {res[:50]}...")
-                return "⚠️ [검열됨] OpenAI 정책에 의해 번역이 거부되었습니다. (로컬 엔진 사용 권장)"
+        refusal_keywords = ["I'm sorry", "I cannot fulfill", "I am unable to", "policy", "not translate"]
+        if any(kw in res for kw in refusal_keywords):
+            log(f"[Warning] ChatGPT refusal detected: {res[:50]}...")
+            return "⚠️ [검열됨] OpenAI 정책에 의해 번역이 거부되었습니다. (로컬 엔진 사용 권장)"
 
-            self.history.extend([{"role":"user","content":text}, {"role":"assistant","content":res}])
-            if len(self.history) > 20:
-                self.history = self.history[-20:]
+        return res
 
-            return res
-        except Exception as e:
-            log(f"[Error] ChatGPT Translation Exception: {e}")
-            return f"⚠️ OpenAI Error: {str(e)}"
+    def _format_error(self, e, model_name):
+        log(f"[Error] ChatGPT Translation Exception: {e}")
+        return f"⚠️ OpenAI Error: {str(e)}"
+
+class OllamaError(RuntimeError):
+    """HTTP error from Ollama; status_code lets the rate-limit stage retry 5xx (e.g. model still loading)"""
+    def __init__(self, status_code, detail):
+        super().__init__(f"{status_code} {detail}")
+        self.status_code = status_code
 
 class LocalEngine(BaseEngine):
+    ENGINE_NAME = "Local"
+    DEFAULT_MODEL = "gemma3:12b"
+    # Native Ollama API (/api/chat): unlike the OpenAI-compatible endpoint it honors keep_alive,
+    # so the model and the evaluated system-prompt prefix stay resident between lines
+    OLLAMA_URL = "http://localhost:11434"
+    WARMUP_URL = OLLAMA_URL + "/"
+    RATE_LIMIT_PREFIX = "LOCAL"
+    KEEP_ALIVE = "30m"
+    # Conservative: local models often use smaller vocabularies, and the budget must fit num_ctx
+    CHARS_PER_TOKEN = 3.5
+    # Room for the system prompt, character notes, story summary and the reply on top of HISTORY_TOKEN_BUDGET
+    NUM_CTX_HEADROOM = 4096
+    NUM_CTX_STEP = 1024
+    # Loading a large model from disk can take far longer than a translation. Chat calls use it too:
+    # a request that arrives while the model is still loading (or was evicted) waits for the load.
+    MODEL_LOAD_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+    PROBE_TIMEOUT = httpx.Timeout(2.0)
+
     def __init__(self):
+        # Set before the base constructor loads the profile (see _configure_engine)
+        self.local_model = self.DEFAULT_MODEL
+        self.keep_alive = self.KEEP_ALIVE
+        # None until a profile is loaded; then LOCAL_NUM_CTX or the size derived from the history budget
+        self.num_ctx = None
+        self.warmup_task = None
         super().__init__()
-        # Defaults to local Ollama API endpoint
-        self.client = OpenAI(base_url="http://localhost:11434/v1", api_key="ollama")
 
     def reload_settings(self, profile_name=None):
         log(f"[Local] Settings reloaded for profile: {profile_name}")
@@ -318,79 +1028,209 @@ class LocalEngine(BaseEngine):
 
         self._clear_caches()
         self._load_ini_settings(profile_name, None)
-        self.history = []
+        self._reset_history()
 
-    def get_explanation(self, text, model_name="gemma3:12b"):
-        log(f"[Local] Ollama Explanation: '{text[:30]}...' (Model: {model_name})")
-        response = self.client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content":  self._get_explanation_prompt()},
-                {"role": "user", "content": text}
-            ],
-            response_format={"type": "json_object"}
-        )
-        return json.loads(response.choices[0].message.content)
+    def _configure_engine(self, config, profile_name):
+        """Applies LOCAL_MODEL, LOCAL_KEEP_ALIVE and LOCAL_NUM_CTX (0 = sized from HISTORY_TOKEN_BUDGET)"""
+        get = lambda key, default: config.get(profile_name, key, fallback=config.get('Settings', key, fallback=default))
+        self.local_model = get('LOCAL_MODEL', self.DEFAULT_MODEL) or self.DEFAULT_MODEL
+        self.keep_alive = self._parse_keep_alive(get('LOCAL_KEEP_ALIVE', self.KEEP_ALIVE))
+        try:
+            num_ctx = int(get('LOCAL_NUM_CTX', '0'))
+        except ValueError as e:
+            log(f"[Warning] Invalid LOCAL_NUM_CTX: {e}")
+            num_ctx = 0
+        self.num_ctx = num_ctx if num_ctx > 0 else self._auto_num_ctx()
 
-    def get_translation(self, text, profile="Settings", model_name="gemma3:12b"):
-        current_dict_str = self._get_character_dict_str(profile)
-        if current_dict_str:
-            story_prompt = (
-                "You are a professional story translator. Translate the text into natural Korean.\n\n"
-                "### RULES:\n"
-                "1. **TRANSLATE EVERYTHING**: Do not skip, summarize, or omit any part. Translate narrative and dialogue fully.\n"
-                "2. Output ONLY the Korean translation. NO introduction, NO explanation, NO conversational filler.\n"
-                "3. **NAME TAG FORMAT (STRICT)**: Apply the 'Name:' format ONLY when a character name is explicitly written in brackets (e.g., [Name], 『Name』, or 「Name」) at the very start of the source line. \n"
-                "4. **NO INFERRED NAMES**: If a line of dialogue does not have a name explicitly attached to it in the source text, DO NOT add, guess, or infer a name tag. Translate it as a simple quote.\n\n"
-                "### RULES for NAMES:\n"
-                "1. **STRICT VERBATIM NAMES**: Use the name exactly as it is used in the source text. If only a given name is used, use only the given name. If only a surname is used, use only the surname. **NEVER expand to a full name unless it is written as a full name in the source.**\n"
-                "2. **DICTIONARY AS SPELLING REFERENCE ONLY**: Use the provided character dictionary only to find the correct Korean spelling for the specific name mentioned. Do not use other parts of the dictionary entry that are not in the source.\n"
-                "3. **PRESERVE HONORIFICS**: If the source includes honorifics (like -san, -kun, -sama), translate them naturally into Korean (씨, 군, 님 등).\n"
-                "4. **NEVER ADD NAMES**: It is a critical failure to add a character name (e.g., '하루코:') if it is not present in the original text. Keep the original structure perfectly.\n\n"
-                "5. Do not infer or add any information about the characters that is not explicitly present in the current input text.\n\n"
-                "### CHARACTER REFERENCE TABLE:\n"
-                f"{current_dict_str}"
-            )
-        else:
-            story_prompt = (
-                "You are a professional story translator specializing in creative media.\n"
-                "Translate the provided text into natural, immersive Korean.\n\n"
-                "### RULES:\n"
-                "1. **TRANSLATE ALL TEXT**: Do not skip or omit any part of the input. Every sentence, including descriptions and narrative, must be fully translated.\n"
-                "2. Output ONLY the Korean translation. NO intro/outro.\n"
-                "3. DO NOT explain the grammar or context.\n"
-                "4. **NAME TAG FORMAT**: If the source text starts with a name in brackets, format it as 'Name:' followed by the dialogue.\n"
-                "4. Maintain the original tone and emotional nuance of the story."
-            )
+    @classmethod
+    def _parse_keep_alive(cls, value):
+        # Ollama reads bare numbers as seconds (-1 = stay loaded, 0 = unload) and strings as durations ("30m", "2h")
+        value = value.strip()
+        try:
+            return int(value)
+        except ValueError:
+            return value or cls.KEEP_ALIVE
+
+    def _auto_num_ctx(self):
+        """Context window that fits the history budget plus prompt headroom, rounded up to NUM_CTX_STEP"""
+        need = max(0, self.history_budget) + self.NUM_CTX_HEADROOM
+        return -(-need // self.NUM_CTX_STEP) * self.NUM_CTX_STEP
+
+    def _context_size(self):
+        return self.num_ctx or self._auto_num_ctx()
+
+    def _model_options(self):
+        # Every request must carry the same num_ctx: Ollama reloads the model when it changes
+        return {"num_ctx": self._context_size()}
+
+    async def warm_up(self):
+        """
+        Loads LOCAL_MODEL in the background with the translation num_ctx and keep_alive,
+        so the first line waits neither for the weights nor for a reload at a different context size
+        """
+        if self.warmup_task is not None and not self.warmup_task.done():
+            self.warmup_task.cancel()
+        self.warmup_task = asyncio.create_task(self._load_model(self.local_model))
+
+    async def _load_model(self, model_name):
+        started = time.perf_counter()
+        try:
+            # A generate request without a prompt only loads the model and sets its keep_alive
+            response = await get_async_http_client().post(self.OLLAMA_URL + "/api/generate", json={
+                "model": model_name, "keep_alive": self.keep_alive, "options": self._model_options()
+            }, timeout=self.MODEL_LOAD_TIMEOUT)
+            self._raise_for_ollama_error(response)
+            log(f"[Local] Model '{model_name}' loaded in {time.perf_counter() - started:.1f}s "
+                f"(num_ctx={self._context_size()}, keep_alive={self.keep_alive}).")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log(f"[Local] Warm-up skipped: {e}")
+
+    @staticmethod
+    def _model_tag(name):
+        # Ollama lists "gemma3" as "gemma3:latest"
+        return name if ":" in name else name + ":latest"
 
+    async def probe(self):
+        """Ollama reachability and whether LOCAL_MODEL is installed and resident, for /health"""
+        status = {"model": self.local_model, "server": "offline", "installed": False, "loaded": False,
+                  "num_ctx": self._context_size(), "keep_alive": self.keep_alive}
+        client = get_async_http_client()
         try:
-            log(f"[Local] Ollama Request: {model_name} | Profile: {profile} | History turns: {len(self.history[-10:])}")
-            messages = [{"role": "system", "content": story_prompt}]
-            messages.extend(self.history[-10:])
-            messages.append({"role": "user", "content": text})
-            response = self.client.chat.completions.create(model=model_name or "gemma3:12b", messages=messages)
-            raw = response.choices[0].message.content.strip()
-
-            # Filters out typical conversational artifacts often generated by local LLMs
-            cleaned_text = raw
-            stop_phrases = ["번역은 다음과 같습니다", "번역 결과:", "The translation is", "natural Korean translation"]
-            for phrase in stop_phrases:
-                if phrase in cleaned_text:
-                    cleaned_text = cleaned_text.split(phrase)[-1].strip(": ").strip()
-
-            self.history.extend([{"role":"user","content":text}, {"role":"assistant","content":cleaned_text}])
-            if len(self.history) > 20: self.history = self.history[-20:]
-            return cleaned_text
+            tags, running = await asyncio.gather(
+                client.get(self.OLLAMA_URL + "/api/tags", timeout=self.PROBE_TIMEOUT),
+                client.get(self.OLLAMA_URL + "/api/ps", timeout=self.PROBE_TIMEOUT)
+            )
+            self._raise_for_ollama_error(tags)
+            self._raise_for_ollama_error(running)
         except Exception as e:
-            error_msg = str(e).lower()
-            log(f"[Error] Local Engine Exception: {error_msg}")
-            # Handling common connection errors for local model deployments
-            if "connection error" in error_msg or "target machine actively refused" in error_msg:
-                return "⚠️ Ollama 서버가 꺼져 있습니다! Ollama 앱을 실행했는지 확인해 주십시오."
-            elif "not found" in error_msg or "404" in error_msg:
-                return f"⚠️ {model_name} 모델이 없습니다! 터미널에서 'ollama run {model_name}'을 입력해서 모델을 받아 주세요."
-            return f"⚠️ 로컬 엔진 오류: {str(e)}"
-
-gemini_brain = GeminiEngine()
-chatgpt_brain = ChatGPTEngine()
-local_brain = LocalEngine()
+            status["error"] = str(e) or type(e).__name__
+            return status
+
+        target = self._model_tag(self.local_model)
+        status["server"] = "online"
+        status["installed"] = any(self._model_tag(m.get("name", "")) == target for m in tags.json().get("models", []))
+        resident = next((m for m in running.json().get("models", []) if self._model_tag(m.get("name", "")) == target), None)
+        if resident is not None:
+            status["loaded"] = True
+            status["expires_at"] = resident.get("expires_at")
+        return status
+
+    def _explanation_request(self, text, model_name):
+        return self._chat_payload(model_name, [
+            {"role": "system", "content":  self._get_explanation_prompt()},
+            {"role": "user", "content": text}
+        ], format="json")
+
+    async def _aexplain(self, text, model_name):
+        log(f"[Local] Ollama Explanation: '{text[:30]}...' (Model: {model_name})")
+        return json.loads(await self._achat(self._explanation_request(text, model_name)))
+
+    async def _asummarize(self, system, text, model_name):
+        return await self._achat(self._chat_payload(model_name, [
+            {"role": "system", "content": system},
+            {"role": "user", "content": text}
+        ]))
+
+    def _chat_payload(self, model_name, messages, stream=False, **extra):
+        payload = {"model": model_name, "messages": messages, "stream": stream,
+                   "keep_alive": self.keep_alive, "options": self._model_options()}
+        payload.update(extra)
+        return payload
+
+    @staticmethod
+    def _raise_for_ollama_error(response):
+        if response.status_code >= 400:
+            # Ollama puts the reason (e.g. "model 'x' not found") in the JSON body
+            try:
+                detail = response.json().get("error", "")
+            except ValueError:
+                detail = response.text
+            raise OllamaError(response.status_code, detail)
+
+    async def _achat(self, payload):
+        response = await get_async_http_client().post(self.OLLAMA_URL + "/api/chat", json=payload, timeout=self.MODEL_LOAD_TIMEOUT)
+        self._raise_for_ollama_error(response)
+        return response.json()["message"]["content"]
+
+    def _compose_story_prompt(self, dict_str):
+        prompt = super()._compose_story_prompt(dict_str)
+        if dict_str:
+            return prompt
+        # Local models tend to append grammar notes to the plain prompt
+        return prompt + "\n5. DO NOT explain the grammar or context."
+
+    def _build_request(self, text, profile, model_name):
+        # Ollama reuses the KV cache of the stable system prompt prefix while the model stays loaded
+        return self._assemble_messages(text, profile, model_name)
+
+    async def _acomplete(self, text, profile, model_name):
+        return await self._achat(self._chat_payload(model_name, self._build_request(text, profile, model_name)))
+
+    async def _astream_request(self, text, profile, model_name):
+        payload = self._chat_payload(model_name, self._build_request(text, profile, model_name), stream=True)
+        # Streamed as NDJSON: one {"message": {"content": ...}, "done": ...} object per line
+        async with get_async_http_client().stream("POST", self.OLLAMA_URL + "/api/chat", json=payload,
+                                                  timeout=self.MODEL_LOAD_TIMEOUT) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                self._raise_for_ollama_error(response)
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(data["error"])
+                chunk = data.get("message", {}).get("content")
+                if chunk:
+                    yield chunk
+
+    def _post_filter(self, text, raw):
+        # Filters out typical conversational artifacts often generated by local LLMs
+        cleaned_text = raw.strip()
+        stop_phrases = ["번역은 다음과 같습니다", "번역 결과:", "The translation is", "natural Korean translation"]
+        for phrase in stop_phrases:
+            if phrase in cleaned_text:
+                cleaned_text = cleaned_text.split(phrase)[-1].strip(": ").strip()
+
+        return cleaned_text
+
+    def _format_error(self, e, model_name):
+        error_msg = str(e).lower()
+        log(f"[Error] Local Engine Exception: {error_msg}")
+        # Handling common connection errors for local model deployments
+        if isinstance(e, httpx.ConnectError) or "connection error" in error_msg or "target machine actively refused" in error_msg:
+            return "⚠️ Ollama 서버가 꺼져 있습니다! Ollama 앱을 실행했는지 확인해 주십시오."
+        elif "not found" in error_msg or "404" in error_msg:
+            return f"⚠️ {model_name} 모델이 없습니다! 터미널에서 'ollama run {model_name}'을 입력해서 모델을 받아 주세요."
+        return f"⚠️ 로컬 엔진 오류: {str(e)}"
+
+ENGINE_CLASSES = {"Gemini": GeminiEngine, "ChatGPT": ChatGPTEngine, "Local": LocalEngine}
+# Engines created so far; each one stays resident (clients, caches, history) once used
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_engine(engine_name):
+    """
+    Returns the engine for an INI ENGINE name, creating it (and importing its SDK) on first use.
+    Unknown names fall back to Gemini, as the INI default does.
+    """
+    engine_cls = ENGINE_CLASSES.get(engine_name, GeminiEngine)
+    engine = _engines.get(engine_cls.ENGINE_NAME)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(engine_cls.ENGINE_NAME)
+            if engine is None:
+                log(f"[System] Creating {engine_cls.ENGINE_NAME} engine on first use.")
+                engine = engine_cls()
+                _engines[engine_cls.ENGINE_NAME] = engine
+    return engine
+
+def loaded_engine(engine_name):
+    """Returns the engine for an INI ENGINE name if it has been created, without taking the creation lock"""
+    return _engines.get(ENGINE_CLASSES.get(engine_name, GeminiEngine).ENGINE_NAME)
+
+def loaded_engines():
+    """Engines that have been created, e.g. to reload or report on only those"""
+    return list(_engines.values())
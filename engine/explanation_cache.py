@@ -0,0 +1,99 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from logger_util import log
+from translation_memory import normalize_source
+
+class ExplanationCache:
+    """
+    Disk-backed cache of parsed word/sentence explanations (the JSON returned by aget_explanation).
+    Shares the translation memory database file and is only used by the server,
+    which also serves the overlay's explanations through /explain.
+    Keys cover the normalized text, engine, model and explanation prompt version.
+    """
+    EVICT_INTERVAL = 50
+
+    def __init__(self, db_path, max_entries=5000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._conn = None
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS explanations ("
+                "key TEXT PRIMARY KEY, engine TEXT NOT NULL, model TEXT NOT NULL, source TEXT NOT NULL, "
+                "result TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_explanations_last_used ON explanations(last_used)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _make_key(source, engine, model, prompt_version):
+        return hashlib.sha1(f"{engine}\x00{model}\x00{prompt_version}\x00{source}".encode('utf-8')).hexdigest()
+
+    def get(self, text, engine, model, prompt_version):
+        """Returns the cached explanation dict or None. Never raises."""
+        source = normalize_source(text)
+        if not source:
+            return None
+        key = self._make_key(source, engine, model, prompt_version)
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute("SELECT result FROM explanations WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE explanations SET last_used = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+                return json.loads(row[0])
+            except Exception as e:
+                log(f"[ExplainCache] Lookup failed: {e}")
+                return None
+
+    def put(self, text, engine, model, prompt_version, result):
+        """Stores a parsed explanation. Error strings and other non-dict results are ignored. Never raises."""
+        source = normalize_source(text)
+        if not source or not isinstance(result, dict):
+            return
+        key = self._make_key(source, engine, model, prompt_version)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO explanations (key, engine, model, source, result, created, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, engine, model, source, json.dumps(result, ensure_ascii=False), now, now)
+                )
+                conn.commit()
+                self._puts_since_evict += 1
+                if self._puts_since_evict >= self.EVICT_INTERVAL:
+                    self._evict()
+            except Exception as e:
+                log(f"[ExplainCache] Store failed: {e}")
+
+    def _evict(self):
+        """Drops the least recently used explanations above the size limit"""
+        self._puts_since_evict = 0
+        conn = self._conn
+        overflow = conn.execute("SELECT COUNT(*) FROM explanations").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM explanations WHERE key IN "
+                "(SELECT key FROM explanations ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+            conn.commit()
+            log(f"[ExplainCache] Evicted {overflow} least recently used entries.")
@@ -0,0 +1,98 @@
+import zlib
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+
+def frame_fingerprint(img):
+    """
+    Fingerprint of a captured frame: CRC-32 of every pixel plus the frame shape.
+    The whole buffer is covered because a new 、 or ー can be a single pixel row or column;
+    CRC-32 runs in a few milliseconds on a full-screen BGRA frame, before any color conversion.
+    """
+    crc = zlib.crc32(np.ascontiguousarray(img).data)
+    return f"{crc:08x}:{img.shape}"
+
+class FrameResultCache:
+    """
+    Remembers endpoint results for the most recent frames.
+    Entries are tagged with the detector state (typical height, read mode, ...) they were
+    computed under, so a learning update or profile switch naturally invalidates them.
+    """
+    def __init__(self, max_frames=4):
+        self.max_frames = max_frames
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, fingerprint, kind, state):
+        with self._lock:
+            entry = self._frames.get(fingerprint)
+            if entry is not None and entry['state'] == state and kind in entry['results']:
+                self._frames.move_to_end(fingerprint)
+                self.stats['hits'] += 1
+                return entry['results'][kind]
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, fingerprint, kind, state, result):
+        with self._lock:
+            entry = self._frames.get(fingerprint)
+            if entry is None or entry['state'] != state:
+                entry = {'state': state, 'results': {}}
+                self._frames[fingerprint] = entry
+            entry['results'][kind] = result
+            self._frames.move_to_end(fingerprint)
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+class RecognitionCache:
+    """
+    Bounded LRU of recognizer output keyed by a hash of each preprocessed line crop.
+    Name tags and earlier lines of a growing message stay pixel-identical between requests,
+    so only new or changed crops need to reach the recognizer.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    @staticmethod
+    def crop_key(crop):
+        digest = hashlib.blake2b(np.ascontiguousarray(crop).data, digest_size=16)
+        digest.update(str(crop.shape).encode('ascii'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return result
+
+    def put(self, key, text, score):
+        with self._lock:
+            self._entries[key] = {'rec_text': text, 'rec_score': score}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
@@ -0,0 +1,71 @@
+import time
+import asyncio
+from collections import deque
+from logger_util import log
+
+class LatencyTracker:
+    """Rolling window of completed upstream call latencies for one engine"""
+    def __init__(self, window=50):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def get_stats(self):
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            'samples': len(self.samples),
+            'p50_ms': round(p50 * 1000) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000) if p95 is not None else None
+        }
+
+# Automatic hedge delay = p95 of the primary, clamped; the default covers the first few requests
+HEDGE_MIN_SAMPLES = 10
+HEDGE_DEFAULT_DELAY = 2.0
+HEDGE_MIN_DELAY = 0.3
+
+def hedge_delay(tracker, delay_ms=0):
+    """Seconds to wait for the primary before firing the secondary (delay_ms 0 = automatic)"""
+    if delay_ms > 0:
+        return delay_ms / 1000.0
+    if len(tracker.samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return max(HEDGE_MIN_DELAY, tracker.percentile(0.95))
+
+async def race_with_hedge(primary, secondary, delay, is_valid):
+    """
+    Starts primary(); if it has not produced a valid result after 'delay' seconds, starts secondary()
+    too and returns whichever valid result arrives first, cancelling the other call.
+    primary and secondary are coroutine factories. Returns (result, 0 for primary / 1 for secondary).
+    Invalid results (errors) never win while the other call can still succeed.
+    """
+    tasks = [asyncio.create_task(primary())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done and is_valid(tasks[0].result()):
+            return tasks[0].result(), 0
+
+        log(f"[Hedge] Primary {'failed' if done else f'slower than {delay:.2f}s'}. Firing secondary engine.")
+        start = time.perf_counter()
+        tasks.append(asyncio.create_task(secondary()))
+        pending = set(tasks) - done
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if is_valid(task.result()):
+                    winner = tasks.index(task)
+                    if winner == 1:
+                        log(f"[Hedge] Secondary won after {time.perf_counter() - start:.2f}s.")
+                    return task.result(), winner
+        # Both failed: the primary's error message is the more relevant one
+        return tasks[0].result(), 0
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,126 @@
+import re
+from collections import deque
+
+# "透（とおる）", "小林 二郎（こばやし じろう）", "Alice (アリス)"
+READING_PATTERN = re.compile(r'^(.*?)\s*[（(](.*?)[）)]\s*$')
+NAME_SPLIT_PATTERN = re.compile(r'[\s・･=＝]+')
+HONORIFICS = ("さん", "くん", "君", "ちゃん", "様", "さま", "先輩", "先生", "殿")
+# Brackets around a name tag at the start of a line: 【まり】, 「ユウ」
+NAME_TAG_OPEN = "【「『[［〈《"
+NAME_TAG_CLOSE = "】」』]］〉》"
+
+def is_kana(ch):
+    return 'ぁ' <= ch <= 'ヿ'
+
+def is_kanji(ch):
+    return '一' <= ch <= '鿿' or '㐀' <= ch <= '䶿' or ch == '々'
+
+def hiragana_to_katakana(text):
+    return "".join(chr(ord(c) + 96) if 'ぁ' <= c <= 'ゖ' else c for c in text)
+
+def name_variants(name):
+    """
+    Surface forms a dictionary name can take in a line: the full name with and without spaces,
+    each part on its own (given name / surname), and the reading in hiragana and katakana.
+    """
+    name = (name or "").strip()
+    match = READING_PATTERN.match(name)
+    forms = [match.group(1), match.group(2)] if match else [name]
+
+    variants = set()
+    for form in forms:
+        parts = [p for p in NAME_SPLIT_PATTERN.split(form.strip()) if p]
+        if not parts:
+            continue
+        candidates = ["".join(parts), " ".join(parts)] + parts
+        for cand in candidates:
+            variants.add(cand)
+            variants.add(hiragana_to_katakana(cand))
+    return {v.lower() for v in variants}
+
+def short_kana_in_context(text, start, end):
+    """A name of 1-2 kana (まり, ユウ) hides inside ordinary words (あまり, つまり); it counts only with an honorific or as a name tag"""
+    if text.startswith(HONORIFICS, end):
+        return True
+    opened = start == 0 or text[start - 1] in NAME_TAG_OPEN
+    closed = end == len(text) or text[end] in NAME_TAG_CLOSE
+    return opened and closed
+
+def single_kanji_in_context(text, start, end):
+    """A one-kanji name (透) counts unless it is part of a longer kanji word (透明, 浸透)"""
+    if text.startswith(HONORIFICS, end):
+        return True
+    return not (start > 0 and is_kanji(text[start - 1])) and not (end < len(text) and is_kanji(text[end]))
+
+def variant_context(variant):
+    """Context check a matched variant must pass, or None when any occurrence counts"""
+    if len(variant) <= 2 and all(is_kana(ch) for ch in variant):
+        return short_kana_in_context
+    if len(variant) == 1 and is_kanji(variant):
+        return single_kanji_in_context
+    return None
+
+class AhoCorasick:
+    """Multi-pattern matcher: one pass over the text finds every dictionary name it contains"""
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [set()]
+
+    def add(self, word, value, check=None):
+        """Registers word for value; check(text, start, end) can reject an occurrence by its surroundings"""
+        node = 0
+        for ch in word:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(set())
+            node = nxt
+        self.out[node].add((value, len(word), check))
+
+    def build(self):
+        """Computes failure links breadth-first. Call once after all words are added."""
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] |= self.out[self.fail[nxt]]
+
+    def find(self, text):
+        found = set()
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for value, length, check in self.out[node]:
+                if check is None or check(text, i + 1 - length, i + 1):
+                    found.add(value)
+        return found
+
+class CharacterIndex:
+    """Finds which character dictionary entries are mentioned in a set of lines"""
+    def __init__(self, names):
+        self.size = len(names)
+        self.automaton = AhoCorasick()
+        for i, name in enumerate(names):
+            for variant in name_variants(name):
+                self.automaton.add(variant, i, variant_context(variant))
+        self.automaton.build()
+
+    def match(self, texts):
+        """Returns the sorted indices of entries whose name appears in any of the texts"""
+        found = set()
+        for text in texts:
+            found |= self.automaton.find((text or "").lower())
+            if len(found) == self.size:
+                break
+        return sorted(found)
@@ -11,12 +11,14 @@ import math
 import tempfile
 import configparser
 import asyncio
-import mmap
 import fugashi
 import re
+import json
+import uuid
+from collections import OrderedDict
 
 from fastapi import FastAPI, Request, Response, HTTPException
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from contextlib import asynccontextmanager
 import uvicorn
 
@@ -27,6 +29,11 @@ import path_util
 import ai_engines
 from PIL import Image, ImageDraw, ImageFont
 import nvl_processor
+import frame_cache
+import shm_transport
+import request_coalescer
+import hedging
+from translation_memory import normalize_source
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -34,17 +41,32 @@ async def lifespan(app: FastAPI):
     init_ocr_engine()
     init_craft_engine()
     log("[System] KO Trans FastAPI Server is ready.")
+    schedule_ai_warm_up()
 
     yield
     log("[System] KO Trans FastAPI Server is shutting down.")
+    if g_warm_up_task is not None:
+        g_warm_up_task.cancel()
+    await ai_engines.close_async_http_client()
 
 # Initialize FastAPI application
 app = FastAPI(title="KO Trans Engine", lifespan=lifespan)
 
 # --- Shared Memory Configuration ---
+# Ring of frame slots with sequence numbers (layout documented in shm_transport.py)
 SHM_NAME = "KO_TRANS_SHM"
-SHM_SIZE = 4000 * 2500 * 4 + 1 # Add 1 byte for status flag
-shm_obj = mmap.mmap(-1, SHM_SIZE, tagname=SHM_NAME)
+SHM_SLOT_COUNT = shm_transport.DEFAULT_SLOT_COUNT
+SHM_SLOT_CAPACITY = shm_transport.DEFAULT_SLOT_CAPACITY
+shm_ring = shm_transport.ShmFrameRing.open(SHM_NAME, SHM_SLOT_COUNT, SHM_SLOT_CAPACITY)
+# Writer signals each published frame, so requests await the signal instead of polling the ring
+SHM_EVENT_NAME = "KO_TRANS_SHM_EVENT"
+shm_notifier = shm_transport.FrameNotifier(SHM_EVENT_NAME)
+SHM_FRAME_TIMEOUT = 0.1
+# A /stabilize session OCRs whatever it has by this point: the client gives up after 15 s (KO_Trans.ahk),
+# and OCR on CPU still needs a few seconds after the last detector pass
+STABILIZE_DEADLINE = 10.0
+
+HEDGE_MODEL_KEYS = {"Gemini": "GEMINI_MODEL", "ChatGPT": "GPT_MODEL", "Local": "LOCAL_MODEL"}
 
 # --- Define the Initialization Function ---
 g_ocr = None
@@ -52,6 +74,22 @@ g_session = None
 g_read_mode = "ADV"
 g_is_jap_read_vertical = False
 g_engine_name = "Gemini"
+g_lang = "eng"
+g_jap_yomigana = False
+# Opt-in hedging: a second engine races the primary when it is slower than the hedge delay
+g_hedge_enabled = False
+g_hedge_engine = "Local"
+g_hedge_model = None
+g_hedge_delay_ms = 0
+# Opt-in progressive refinement: a fast draft engine answers first, the profile's engine replaces it
+g_draft_enabled = False
+g_draft_engine = "Local"
+g_draft_model = None
+# Speculative explanations for the study overlay (EXPLAIN_PREFETCH): one in flight, replaced by the next line
+g_explain_prefetch_enabled = False
+g_explain_prefetch_task = None
+# Background AI engine warm-up started at startup and by /reload
+g_warm_up_task = None
 g_jap_tagger = None
 g_active_profile = "Settings"
 g_current_device = "Unknown"
@@ -68,6 +106,19 @@ g_pending_count = 0
 MAX_HEIGHT_HISTORY = 15
 PENDING_THRESHOLD = 3
 
+# Results of recent frames, keyed by pixel fingerprint (skips CRAFT/recognition for unchanged frames)
+g_frame_cache = frame_cache.FrameResultCache()
+# Recognizer output per preprocessed line crop (unchanged lines skip recognition)
+g_rec_cache = frame_cache.RecognitionCache()
+# In-flight translation calls: per-session superseding + coalescing of identical requests
+g_translation_requests = request_coalescer.RequestCoalescer()
+# request id -> task producing the final translation behind a draft (fetched via /translate/final)
+g_final_translations = OrderedDict()
+MAX_PENDING_FINALS = 32
+FINAL_WAIT_TIMEOUT = 60.0
+# Head start for the next line before an explanation prefetch uses the provider
+EXPLAIN_PREFETCH_DELAY = 1.5
+
 # Function implementations
 def init_craft_engine():
     """
@@ -90,8 +141,12 @@ def init_craft_engine():
 def init_ocr_engine():
     """Reads settings.ini and initializes the OCR engine based on ACTIVE_PROFILE."""
     global g_ocr, g_last_crop_pos, g_current_device, g_read_mode, g_is_jap_read_vertical, g_engine_name, g_jap_tagger, g_active_profile
+    global g_lang, g_jap_yomigana, g_hedge_enabled, g_hedge_engine, g_hedge_model, g_hedge_delay_ms
+    global g_draft_enabled, g_draft_engine, g_draft_model, g_explain_prefetch_enabled
 
     g_last_crop_pos = {'x': -1, 'y': -1}
+    g_frame_cache.clear()
+    g_rec_cache.clear()
     config = configparser.ConfigParser()
     lang_from_ini = 'eng'
     active_profile = 'Settings'
@@ -119,7 +174,33 @@ def init_ocr_engine():
             lang_from_ini = config.get(active_profile, 'LANG',
                                      fallback=config.get('Settings', 'LANG', fallback='eng'))
 
+            jap_yomigana = config.get(active_profile, 'JAP_YOMIGANA',
+                                   fallback=config.get('Settings', 'JAP_YOMIGANA', fallback='0'))
+
             g_active_profile = active_profile
+            g_jap_yomigana = jap_yomigana == '1'
+
+            get = lambda key, default: config.get(active_profile, key, fallback=config.get('Settings', key, fallback=default))
+            g_hedge_enabled = get('HEDGE_ENABLED', '0') == '1'
+            g_hedge_engine = get('HEDGE_ENGINE', 'Local')
+            # The secondary uses the model configured for that engine (same keys as the AHK client)
+            g_hedge_model = get(HEDGE_MODEL_KEYS.get(g_hedge_engine, ''), '') or None
+            try:
+                g_hedge_delay_ms = int(get('HEDGE_DELAY_MS', '0'))
+            except ValueError:
+                g_hedge_delay_ms = 0
+            if g_hedge_enabled:
+                log(f"[Config] Hedging: {g_engine_name} -> {g_hedge_engine} after {g_hedge_delay_ms or 'p95'} ms")
+
+            g_draft_enabled = get('DRAFT_ENABLED', '0') == '1'
+            g_draft_engine = get('DRAFT_ENGINE', 'Local')
+            g_draft_model = get(HEDGE_MODEL_KEYS.get(g_draft_engine, ''), '') or None
+            if g_draft_enabled:
+                log(f"[Config] Draft translations: {g_draft_engine} first, replaced by {g_engine_name}")
+
+            g_explain_prefetch_enabled = get('EXPLAIN_PREFETCH', '0') == '1'
+            if g_explain_prefetch_enabled:
+                log("[Config] Explanation prefetch enabled for translated lines.")
 
             if lang_from_ini == 'jap' and jap_read_vertical == '1':
                 g_is_jap_read_vertical = True
@@ -131,6 +212,7 @@ def init_ocr_engine():
         except Exception as e:
             log(f"--- [Warning] INI Read Error: {e} ---")
 
+    g_lang = lang_from_ini
     if lang_from_ini == 'jap':
         if g_jap_tagger is None:
             try:
@@ -173,41 +255,55 @@ def init_ocr_engine():
         g_current_device = "CPU"
         log("--- 💻 KO Trans: Falling back to CPU Mode ---")
 
-async def read_shm_with_flag(w, h):
-    """Safely reads image from shared memory by checking status flags (0:Idle, 1:Writing, 2:Ready)"""
-    img_size = w * h * 4
-
-    # Check flag (wait up to 100ms for data readiness)
-    success = False
-    last_flag = -1
-    for _ in range(10):
-        shm_obj.seek(0)
-        # Read the first byte to determine memory state
-        last_flag = int.from_bytes(shm_obj.read(1), "little")
-        if last_flag == 2: # 2 indicates 'Ready' for consumption
-            success = True
+async def acquire_shm_frame(w, h):
+    """Waits for a new frame in the ring and maps it without copying (see shm_transport.ShmFrame)"""
+    # Wait up to 100ms for a frame newer than the last one consumed.
+    # The signal is cleared before each check, so a frame published in between still wakes us.
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SHM_FRAME_TIMEOUT
+    shm_notifier.clear()
+    frame = shm_ring.acquire_latest()
+    while frame is None:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
             break
-        await asyncio.sleep(0.01)
+        await shm_notifier.wait(remaining)
+        shm_notifier.clear()
+        frame = shm_ring.acquire_latest()
 
-    if not success:
-        if last_flag != 0: # Log only if not in Idle state
-            log(f"[SHM] ⚠️ Flag Timeout. Current Flag: {last_flag} (Expected: 2)")
+    if frame is None:
         return None
 
-    # Read raw pixel data (pointer is at offset 1 after reading flag)
-    raw_data = shm_obj.read(img_size)
-
-    # Reset flag to 0 (Idle) after reading to allow next write
-    shm_obj.seek(0)
-    shm_obj.write(b'\x00')
-
-    return raw_data
+    fh, fw = frame.pixels.shape[:2]
+    if (fw, fh) != (w, h):
+        # The slot header is authoritative; the request size is only what the client expected
+        log(f"[SHM] Frame size {fw}x{fh} differs from request {w}x{h}. Using frame header.")
+    return frame
 
 # Lightweight endpoint for health checks
 @app.get("/health")
 async def health_check():
     global g_current_device
-    return {"status": "online", "device": g_current_device}
+    health = {"status": "online", "device": g_current_device}
+    # Only an engine already in use is probed; /health must not create one
+    local = next((brain for brain in ai_engines.loaded_engines() if brain.ENGINE_NAME == "Local"), None)
+    if local is not None:
+        health["local_model"] = await local.probe()
+    return health
+
+# Cache counters for tuning (translation memory hit / near-hit / miss)
+@app.get("/stats")
+async def get_stats():
+    return {
+        "translation_memory": ai_engines.translation_memory.get_stats(),
+        "frame_cache": g_frame_cache.get_stats(),
+        "recognition_cache": g_rec_cache.get_stats(),
+        "translation_requests": g_translation_requests.get_stats(),
+        "latency": {brain.ENGINE_NAME: brain.latency.get_stats()
+                    for brain in ai_engines.loaded_engines()},
+        "rate_limits": {brain.ENGINE_NAME: brain.rate_limiter.get_stats()
+                        for brain in ai_engines.loaded_engines()}
+    }
 
 # Endpoint to reload configuration and restart all engines
 @app.get("/reload")
@@ -221,10 +317,11 @@ async def reload_engine():
 
         try:
             # Reload engine settings asynchronously to prevent blocking during API client setup
-            await asyncio.to_thread(ai_engines.chatgpt_brain.reload_settings, g_active_profile)
-            await asyncio.to_thread(ai_engines.gemini_brain.reload_settings, g_active_profile)
-            await asyncio.to_thread(ai_engines.local_brain.reload_settings, g_active_profile)
+            # Only engines already in use are refreshed; others are created with the new profile on first use
+            for brain in ai_engines.loaded_engines():
+                await asyncio.to_thread(brain.reload_settings, g_active_profile)
             log(f"[Reload] AI Engines reloaded with profile '{g_active_profile}'.")
+            schedule_ai_warm_up()
         except Exception as e:
             log(f"[Warning] AI Engine reload failed: {e}")
 
@@ -276,6 +373,11 @@ def select_best_adv_group(groups, res_img, target_w, target_h):
 
     return max(groups, key=lambda g: calculate_score(g, res_img))
 
+def get_detector_state():
+    """Detector inputs besides the pixels. Cached frame results are only valid under the same state."""
+    # The tracked crop position decides which text group is selected
+    return (g_typical_h, g_read_mode, g_is_jap_read_vertical, g_last_crop_pos['x'], g_last_crop_pos['y'])
+
 def get_read_mode():
     global g_read_mode
     return g_read_mode
@@ -288,6 +390,7 @@ def get_smart_crop(img, update_history=True):
     """
     Common detection flow for both ADV and NVL modes.
     Directly transposes existing horizontal logic for Japanese vertical reading.
+    Takes the BGRA frame as-is; only the downscaled detector input is converted to BGR.
     """
     global g_typical_h, g_h_history, g_session
     if img is None:
@@ -311,7 +414,7 @@ def get_smart_crop(img, update_history=True):
 
     # Ensure dimensions are multiples of 32 for CRAFT ONNX model requirements
     target_w, target_h = (tw // 32 + 1) * 32, (th // 32 + 1) * 32
-    res_img = cv2.resize(img, (target_w, target_h), interpolation=cv2.INTER_LINEAR)
+    res_img = cv2.cvtColor(cv2.resize(img, (target_w, target_h), interpolation=cv2.INTER_LINEAR), cv2.COLOR_BGRA2BGR)
 
     # 1. CRAFT Detection
     res_img_float = res_img.astype(np.float32)
@@ -501,34 +604,37 @@ def get_smart_crop(img, update_history=True):
 
     # 4. Debug Visualization & Mapping
     sx, sy = orig_w / target_w, orig_h / target_h
-    debug_img = img.copy()
 
-    # Draw all raw candidates in green
-    for cand in raw_candidates:
-        cx, cy, cw, ch = cand['box']
-        cv2.rectangle(debug_img, (int(cx * sx), int(cy * sy)),
-                      (int((cx + cw) * sx), int((cy + ch) * sy)), (0, 255, 0), 1)
+    # Full-frame copy and drawing only when the debug image is actually written
+    if DEBUG and update_history:
+        debug_img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
 
-    # Draw red "Detection Area" boxes
-    if mode == 'NVL' and paragraph_groups:
-        for group in paragraph_groups:
-            all_pts = np.concatenate([c['cnt'] for c in group])
+        # Draw all raw candidates in green
+        for cand in raw_candidates:
+            cx, cy, cw, ch = cand['box']
+            cv2.rectangle(debug_img, (int(cx * sx), int(cy * sy)),
+                          (int((cx + cw) * sx), int((cy + ch) * sy)), (0, 255, 0), 1)
+
+        # Draw red "Detection Area" boxes
+        if mode == 'NVL' and paragraph_groups:
+            for group in paragraph_groups:
+                all_pts = np.concatenate([c['cnt'] for c in group])
+                gx, gy, gw, gh = cv2.boundingRect(all_pts)
+                rx, ry, rw, rh = int(gx * sx), int(gy * sy), int(gw * sx), int(gh * sy)
+                cv2.rectangle(debug_img, (rx - 5, ry - 5), (rx + rw + 5, ry + rh + 5), (0, 0, 255), 2)
+        elif selected_boxes:
+            all_pts = np.concatenate([b['cnt'] for b in selected_boxes])
             gx, gy, gw, gh = cv2.boundingRect(all_pts)
             rx, ry, rw, rh = int(gx * sx), int(gy * sy), int(gw * sx), int(gh * sy)
             cv2.rectangle(debug_img, (rx - 5, ry - 5), (rx + rw + 5, ry + rh + 5), (0, 0, 255), 2)
-    elif selected_boxes:
-        all_pts = np.concatenate([b['cnt'] for b in selected_boxes])
-        gx, gy, gw, gh = cv2.boundingRect(all_pts)
-        rx, ry, rw, rh = int(gx * sx), int(gy * sy), int(gw * sx), int(gh * sy)
-        cv2.rectangle(debug_img, (rx - 5, ry - 5), (rx + rw + 5, ry + rh + 5), (0, 0, 255), 2)
 
-    if DEBUG and update_history:
         debug_save_path = os.path.join(tempfile.gettempdir(), "image_ko_trans_debug_craft.jpg")
         cv2.imwrite(debug_save_path, debug_img)
 
-    # Update g_typical_h using the width(vertical) or height(horizontal) of line boxes
+    # Update g_typical_h using the width(vertical) or height(horizontal) of line boxes.
+    # The pending value is computed for /detect too so /ocr can reuse that detection as-is.
     pending_avg_val = -1.0
-    if selected_boxes and update_history:
+    if selected_boxes:
         should_learn = True
         if is_vertical:
             # Only learn if it's a tall column (H >= 2*W)
@@ -555,159 +661,287 @@ async def do_detect(request: Request):
         if not w or not h:
             return PlainTextResponse("0,0,0")
 
-        img_size = w * h * 4
-
-        raw_data = await read_shm_with_flag(w, h)
-
-        actual_size = len(raw_data)
-        if actual_size < img_size:
+        if w * h * 4 > SHM_SLOT_CAPACITY:
             return PlainTextResponse("Data Underflow")
 
-        img = np.frombuffer(raw_data, dtype=np.uint8).reshape((h, w, 4))
-        full_img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-
-        _, text_boxes, _ = await asyncio.to_thread(get_smart_crop, full_img, False)
+        frame = await acquire_shm_frame(w, h)
+        if frame is None:
+            return PlainTextResponse("0,0,0")
 
-        count = len(text_boxes)
-        area = sum(b['w'] * b['h'] for b in text_boxes)
+        with frame:
+            # Identical pixels produce identical boxes, so skip the CRAFT pass entirely
+            fingerprint = frame_cache.frame_fingerprint(frame.pixels)
+            cached = g_frame_cache.get(fingerprint, 'detect', get_detector_state())
+            if cached is not None:
+                return PlainTextResponse(cached)
 
-        return PlainTextResponse(f"{count},{area},{int(g_typical_h)}")
+            result = await run_detect(frame.pixels, fingerprint)
+        g_frame_cache.put(fingerprint, 'detect', get_detector_state(), result)
+        return PlainTextResponse(result)
     except Exception as e:
         log(f"[Error] Detect endpoint failed:\n{traceback.format_exc()}")
         return PlainTextResponse("0,0,0")
 
+async def run_detect(img, fingerprint):
+    """Runs text detection on a BGRA frame and summarizes it as 'count,area,typical_h'"""
+    _, text_boxes, pending_val = await asyncio.to_thread(get_smart_crop, img, False)
+    # Keep the boxes so a following /ocr on the same frame can skip the CRAFT pass
+    g_frame_cache.put(fingerprint, 'boxes', get_detector_state(), (text_boxes, pending_val))
+
+    count = len(text_boxes)
+    area = sum(b['w'] * b['h'] for b in text_boxes)
+
+    return f"{count},{area},{int(g_typical_h)}"
+
+# Server-side stability session (replaces the client-driven /detect polling loop)
+@app.post("/stabilize")
+async def do_stabilize(request: Request):
+    """
+    Watches successive SHM frames until the detected text box set stops changing,
+    then runs OCR on the settled frame. The client only keeps writing fresh frames.
+    Response: 'count,area,typical_h' on the first line, the /ocr payload on the second.
+    """
+    try:
+        data = await request.json()
+        w, h = data.get("w"), data.get("h")
+        if not w or not h: return PlainTextResponse("0,0,0\n")
+
+        # Same defaults as the former client loop: GPU (fast/precise) vs CPU (slower/efficient)
+        is_gpu = g_current_device == "GPU"
+        required_stable = int(data.get("required", 2 if is_gpu else 1))
+        interval = int(data.get("interval", 150 if is_gpu else 50)) / 1000.0
+        max_checks = int(data.get("max_checks", 20 if is_gpu else 30))
+
+        stable_count, prev_count, prev_area = 0, 0, 0
+        curr_count, curr_area = 0, 0
+
+        ocr_result = ""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STABILIZE_DEADLINE
+        for check in range(max_checks):
+            frame = await acquire_shm_frame(w, h)
+            if frame is None:
+                if loop.time() >= deadline:
+                    break
+                await asyncio.sleep(interval)
+                continue
+
+            with frame:
+                fingerprint = frame_cache.frame_fingerprint(frame.pixels)
+                summary = g_frame_cache.get(fingerprint, 'detect', get_detector_state())
+                if summary is None:
+                    summary = await run_detect(frame.pixels, fingerprint)
+                    g_frame_cache.put(fingerprint, 'detect', get_detector_state(), summary)
+
+                parts = summary.split(",")
+                curr_count, curr_area = int(parts[0]), int(parts[1])
+
+                if curr_count == 0:
+                    stable_count = 0
+                    prev_area = 0
+                else:
+                    # Reset stability if rapid area changes occur (30%+ change indicates transition or noise)
+                    area_change = (abs(curr_area - prev_area) / prev_area) * 100 if prev_area > 0 else 0
+                    if area_change > 30.0:
+                        stable_count = 0
+                    elif prev_area > 0 and curr_count == prev_count and area_change < 5.0:
+                        stable_count += 1
+                    else:
+                        stable_count = 0
+                    prev_count, prev_area = curr_count, curr_area
+
+                is_stable = stable_count >= required_stable
+                out_of_time = loop.time() >= deadline
+                if is_stable or out_of_time or check == max_checks - 1:
+                    if is_stable:
+                        log("[Stability] Screen Stable. Proceeding.")
+                    elif out_of_time:
+                        log(f"[Stability] No stable frame within {STABILIZE_DEADLINE:.0f}s. Using the latest frame.")
+                    # OCR the settled frame while it is still reserved in shared memory
+                    ocr_result = g_frame_cache.get(fingerprint, 'ocr', get_detector_state())
+                    if ocr_result is None:
+                        ocr_result = await run_ocr(frame.pixels, fingerprint)
+                        g_frame_cache.put(fingerprint, 'ocr', get_detector_state(), ocr_result)
+                    break
+            await asyncio.sleep(interval)
+
+        return PlainTextResponse(f"{curr_count},{curr_area},{int(g_typical_h)}\n{ocr_result}")
+    except Exception as e:
+        log(f"[Error] Stabilize endpoint failed:\n{traceback.format_exc()}")
+        return PlainTextResponse("0,0,0\n")
+
 # Paddle OCR
 @app.post("/ocr")
 async def do_ocr(request: Request):
     """Endpoint with Axis-Swapped RTL text assembly support."""
-    global g_ocr, g_typical_h
     try:
         data = await request.json()
         w, h = data.get("w"), data.get("h")
         if not w or not h: return PlainTextResponse("0,0,0")
 
-        raw_data = await read_shm_with_flag(w, h)
-        if raw_data is None: return PlainTextResponse("")
-
-        img = np.frombuffer(raw_data, dtype=np.uint8).reshape((h, w, 4))
-        full_img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-        is_vert = is_jap_read_vertical()
-
-        if DEBUG:
-            cv2.imwrite(os.path.join(tempfile.gettempdir(), "image_ko_trans_capture.jpg"), full_img)
-
-        # Offload smart crop calculation to keep server responsive
-        _, text_boxes, pending_val = await asyncio.to_thread(get_smart_crop, full_img, True)
-        if not text_boxes: return PlainTextResponse("")
-
-        # Calculate the bounding box of the entire detected area for ROI feedback
-        all_x = [b['x'] for b in text_boxes]
-        all_y = [b['y'] for b in text_boxes]
-        all_w = [b['w'] for b in text_boxes]
-        all_h = [b['h'] for b in text_boxes]
-
-        bx, by = min(all_x), min(all_y)
-        bw = max(x + w for x, w in zip(all_x, all_w)) - bx
-        bh = max(y + h for y, h in zip(all_y, all_h)) - by
-        roi_str = f"{bx},{by},{bw},{bh}"
-
-        recognizer = getattr(g_ocr, 'paddlex_pipeline', None)
-        internal_p = getattr(recognizer, '_pipeline', recognizer)
-        engine = getattr(internal_p, 'text_rec_model', None)
-        if not engine: return PlainTextResponse("")
-
-        img_list = []
-        valid_indices = []
-        for i, box in enumerate(text_boxes):
-            bx_box, by_box, bw_box, bh_box = box['x'], box['y'], box['w'], box['h']
-            char_size = bw_box if is_vert else bh_box
-
-            pad = int(char_size * (0.6 if is_vert else 0.3))
-            y1, y2 = max(0, by_box - pad), min(full_img.shape[0], by_box + bh_box + pad)
-            x1, x2 = max(0, bx_box - pad), min(full_img.shape[1], bx_box + bw_box + pad)
-            sub = full_img[y1:y2, x1:x2]
-
-            if sub.size > 0:
-                if is_vert and bh_box > bw_box * 1.5:
-                    sub = cv2.rotate(sub, cv2.ROTATE_90_COUNTERCLOCKWISE)
-
-                # Upscale small text lines
-                if char_size < 45:
-                    sub = cv2.resize(sub, None, fx=2.0, fy=2.0, interpolation=cv2.INTER_CUBIC)
-
-                # Write crops to file only in DEBUG mode for performance
-                if DEBUG:
-                    crop_path = os.path.join(tempfile.gettempdir(), f"image_ko_trans_crop_{i}.jpg")
-                    cv2.imwrite(crop_path, sub)
-
-                img_list.append(sub)
-                valid_indices.append(i)
-
-        if not img_list: return PlainTextResponse("")
-
-        rec_results = await asyncio.to_thread(lambda: list(engine.predict(img_list)))
-
-        raw_boxes = []
-        for i, res in enumerate(rec_results):
-            # Parse results from the internal paddlex engine dict format
-            text, score = res.get('rec_text', ""), float(res.get('rec_score', 0.0))
-            if score >= 0.5 and text:
-                box = text_boxes[valid_indices[i]]
-                raw_boxes.append({'x': box['x'], 'y': box['y'], 'w': box['w'], 'h': box['h'], 'text': text})
-
-        if not raw_boxes: return PlainTextResponse("")
-
-        if is_vert:
-            # Vertical RTL Assembly: Group columns Right-to-Left, sort within columns Top-to-Bottom
-            raw_boxes.sort(key=lambda b: b['x'], reverse=True)
-            lines = []
-            while raw_boxes:
-                base = raw_boxes.pop(0)
-                curr_line, remaining = [base], []
-                base_cx = base['x'] + base['w'] / 2
-                for b in raw_boxes:
-                    # Check for X-axis overlap to group characters into the same vertical column
-                    if abs(base_cx - (b['x'] + b['w'] / 2)) < base['w'] * 0.8:
-                        curr_line.append(b)
-                    else:
-                        remaining.append(b)
-                # Sort characters within the column from top to bottom
-                curr_line.sort(key=lambda b: b['y'])
-                lines.append(curr_line)
-                raw_boxes = remaining
-            final_text = "".join(["".join([b['text'] for b in l]) for l in lines]).strip()
-        else:
-            # Standard Horizontal Assembly: Sort lines by Y then characters by X
-            raw_boxes.sort(key=lambda b: b['y'])
-            rows = []
-            while raw_boxes:
-                base = raw_boxes.pop(0)
-                curr_row, remaining = [base], []
-                for b in raw_boxes:
-                    overlap = max(0, min(base['y']+base['h'], b['y']+b['h']) - max(base['y'], b['y']))
-                    if overlap > min(base['h'], b['h']) * 0.5:
-                        curr_row.append(b)
-                    else:
-                        remaining.append(b)
-                curr_row.sort(key=lambda b: b['x'])
-                rows.append(curr_row)
-                raw_boxes = remaining
-            final_text = " ".join(["".join([b['text'] for b in r]) for r in rows]).strip()
-
-        if len(final_text) >= 5 and pending_val > 0:
-            update_typical_h(pending_val)
-        elif pending_val > 0:
-            log(f"[Learning] Learning skipped. Text too short ({len(final_text)} chars).")
-
-        final_text = apply_custom_replacements(final_text)
-
-        log(f"[OCR Result] Mode: {'Vert' if is_vert else 'Horiz'} | Text: {final_text}")
-        return PlainTextResponse(f"{roi_str}|{fix_katakana_confusion(final_text)}")
+        return PlainTextResponse(await ocr_latest_frame(w, h))
 
     except Exception as e:
         log(f"[Exception] OCR Logic Error:\n{traceback.format_exc()}")
         return PlainTextResponse("")
 
+async def ocr_latest_frame(w, h):
+    """Runs OCR on the newest ring frame (or reuses the result for an unchanged frame)"""
+    frame = await acquire_shm_frame(w, h)
+    if frame is None: return ""
+
+    with frame:
+        fingerprint = frame_cache.frame_fingerprint(frame.pixels)
+        cached = g_frame_cache.get(fingerprint, 'ocr', get_detector_state())
+        if cached is not None:
+            log("[FrameCache] Frame unchanged. Reusing previous OCR result.")
+            return cached
+
+        result = await run_ocr(frame.pixels, fingerprint)
+    # Tagged with the post-learning state so the next identical frame hits
+    g_frame_cache.put(fingerprint, 'ocr', get_detector_state(), result)
+    return result
+
+async def run_ocr(img, fingerprint):
+    """Detects, recognizes and assembles text from a BGRA frame. Returns 'x,y,w,h|text' or ''."""
+    global g_ocr, g_typical_h
+    is_vert = is_jap_read_vertical()
+
+    if DEBUG:
+        cv2.imwrite(os.path.join(tempfile.gettempdir(), "image_ko_trans_capture.jpg"), cv2.cvtColor(img, cv2.COLOR_BGRA2BGR))
+
+    # Reuse the detection from a preceding /detect on the same frame when available
+    detection = g_frame_cache.get(fingerprint, 'boxes', get_detector_state())
+    if detection is not None:
+        text_boxes, pending_val = detection
+        log("[FrameCache] Reusing detection boxes from /detect.")
+    else:
+        # Offload smart crop calculation to keep server responsive
+        _, text_boxes, pending_val = await asyncio.to_thread(get_smart_crop, img, True)
+    if not text_boxes: return ""
+
+    # Calculate the bounding box of the entire detected area for ROI feedback
+    all_x = [b['x'] for b in text_boxes]
+    all_y = [b['y'] for b in text_boxes]
+    all_w = [b['w'] for b in text_boxes]
+    all_h = [b['h'] for b in text_boxes]
+
+    bx, by = min(all_x), min(all_y)
+    bw = max(x + w for x, w in zip(all_x, all_w)) - bx
+    bh = max(y + h for y, h in zip(all_y, all_h)) - by
+    roi_str = f"{bx},{by},{bw},{bh}"
+
+    recognizer = getattr(g_ocr, 'paddlex_pipeline', None)
+    internal_p = getattr(recognizer, '_pipeline', recognizer)
+    engine = getattr(internal_p, 'text_rec_model', None)
+    if not engine: return ""
+
+    img_list = []
+    valid_indices = []
+    for i, box in enumerate(text_boxes):
+        bx_box, by_box, bw_box, bh_box = box['x'], box['y'], box['w'], box['h']
+        char_size = bw_box if is_vert else bh_box
+
+        pad = int(char_size * (0.6 if is_vert else 0.3))
+        y1, y2 = max(0, by_box - pad), min(img.shape[0], by_box + bh_box + pad)
+        x1, x2 = max(0, bx_box - pad), min(img.shape[1], bx_box + bw_box + pad)
+        sub = img[y1:y2, x1:x2]
+
+        if sub.size > 0:
+            # Only the line region is materialized (and converted) out of the shared frame
+            sub = cv2.cvtColor(sub, cv2.COLOR_BGRA2BGR)
+            if is_vert and bh_box > bw_box * 1.5:
+                sub = cv2.rotate(sub, cv2.ROTATE_90_COUNTERCLOCKWISE)
+
+            # Upscale small text lines
+            if char_size < 45:
+                sub = cv2.resize(sub, None, fx=2.0, fy=2.0, interpolation=cv2.INTER_CUBIC)
+
+            # Write crops to file only in DEBUG mode for performance
+            if DEBUG:
+                crop_path = os.path.join(tempfile.gettempdir(), f"image_ko_trans_crop_{i}.jpg")
+                cv2.imwrite(crop_path, sub)
+
+            img_list.append(sub)
+            valid_indices.append(i)
+
+    if not img_list: return ""
+
+    # Only crops that were not recognized before go to the recognizer
+    rec_results = [None] * len(img_list)
+    crop_keys = [g_rec_cache.crop_key(sub) for sub in img_list]
+    pending = []
+    for i, key in enumerate(crop_keys):
+        rec_results[i] = g_rec_cache.get(key)
+        if rec_results[i] is None:
+            pending.append(i)
+
+    if pending:
+        pending_imgs = [img_list[i] for i in pending]
+        predicted = await asyncio.to_thread(lambda: list(engine.predict(pending_imgs)))
+        for i, res in zip(pending, predicted):
+            rec_results[i] = {'rec_text': res.get('rec_text', ""), 'rec_score': float(res.get('rec_score', 0.0))}
+            g_rec_cache.put(crop_keys[i], rec_results[i]['rec_text'], rec_results[i]['rec_score'])
+    if len(pending) < len(img_list):
+        log(f"[RecCache] {len(img_list) - len(pending)}/{len(img_list)} line crops reused.")
+
+    raw_boxes = []
+    for i, res in enumerate(rec_results):
+        # Parse results from the internal paddlex engine dict format
+        text, score = res.get('rec_text', ""), float(res.get('rec_score', 0.0))
+        if score >= 0.5 and text:
+            box = text_boxes[valid_indices[i]]
+            raw_boxes.append({'x': box['x'], 'y': box['y'], 'w': box['w'], 'h': box['h'], 'text': text})
+
+    if not raw_boxes: return ""
+
+    if is_vert:
+        # Vertical RTL Assembly: Group columns Right-to-Left, sort within columns Top-to-Bottom
+        raw_boxes.sort(key=lambda b: b['x'], reverse=True)
+        lines = []
+        while raw_boxes:
+            base = raw_boxes.pop(0)
+            curr_line, remaining = [base], []
+            base_cx = base['x'] + base['w'] / 2
+            for b in raw_boxes:
+                # Check for X-axis overlap to group characters into the same vertical column
+                if abs(base_cx - (b['x'] + b['w'] / 2)) < base['w'] * 0.8:
+                    curr_line.append(b)
+                else:
+                    remaining.append(b)
+            # Sort characters within the column from top to bottom
+            curr_line.sort(key=lambda b: b['y'])
+            lines.append(curr_line)
+            raw_boxes = remaining
+        final_text = "".join(["".join([b['text'] for b in l]) for l in lines]).strip()
+    else:
+        # Standard Horizontal Assembly: Sort lines by Y then characters by X
+        raw_boxes.sort(key=lambda b: b['y'])
+        rows = []
+        while raw_boxes:
+            base = raw_boxes.pop(0)
+            curr_row, remaining = [base], []
+            for b in raw_boxes:
+                overlap = max(0, min(base['y']+base['h'], b['y']+b['h']) - max(base['y'], b['y']))
+                if overlap > min(base['h'], b['h']) * 0.5:
+                    curr_row.append(b)
+                else:
+                    remaining.append(b)
+            curr_row.sort(key=lambda b: b['x'])
+            rows.append(curr_row)
+            raw_boxes = remaining
+        final_text = " ".join(["".join([b['text'] for b in r]) for r in rows]).strip()
+
+    if len(final_text) >= 5 and pending_val > 0:
+        update_typical_h(pending_val)
+    elif pending_val > 0:
+        log(f"[Learning] Learning skipped. Text too short ({len(final_text)} chars).")
+
+    final_text = apply_custom_replacements(final_text)
+
+    log(f"[OCR Result] Mode: {'Vert' if is_vert else 'Horiz'} | Text: {final_text}")
+    return f"{roi_str}|{fix_katakana_confusion(final_text)}"
+
 # Dedicated Yomigana endpoint
 @app.post("/furigana")
 async def do_furigana(request: Request):
@@ -723,6 +957,243 @@ async def do_furigana(request: Request):
         log(f"[Error] Furigana Endpoint Error: {e}")
         return PlainTextResponse(text)
 
+# Fused OCR -> furigana -> translation
+@app.post("/pipeline")
+async def do_pipeline(request: Request):
+    """
+    Replaces the /ocr, /furigana, /translate round trips for one dialogue line.
+    Request: {"w", "h", "profile", "model", "furigana" (optional, defaults to JAP_YOMIGANA), "stream"}.
+    Furigana and translation start together as soon as recognition finishes.
+    Response: {"roi": [x, y, w, h], "text", "furigana", "translation"}; with "stream": true the same
+    fields arrive as SSE events 'ocr', 'furigana' and 'translation' in completion order, then 'done'.
+    A translation replaced by a newer request from the same "session" comes back as {"superseded": true}.
+    With DRAFT_ENABLED, a 'draft' event (fast engine) usually precedes 'translation'; the JSON form includes both.
+    """
+    try:
+        data = await request.json()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    w, h = data.get("w"), data.get("h")
+    profile_name = data.get("profile", g_active_profile)
+    model_name = data.get("model")
+    session = data.get("session", "default")
+    want_furigana = data.get("furigana", g_jap_yomigana) and g_lang == 'jap'
+
+    async def stages():
+        ocr_result = await ocr_latest_frame(w, h) if w and h else ""
+        roi, text = None, ""
+        if "|" in ocr_result:
+            roi_str, text = ocr_result.split("|", 1)
+            roi = [int(v) for v in roi_str.split(",")]
+        yield "ocr", {"roi": roi, "text": text}
+        if not text:
+            return
+
+        async def run_stage(name, coro):
+            # A failing stage reports an empty/error value instead of taking the other stages down with it
+            try:
+                return name, await coro
+            except request_coalescer.Superseded:
+                # A superseded draft is just dropped; the translation stage reports the supersede
+                return ("superseded", True) if name == "translation" else (name, "")
+            except Exception as e:
+                log(f"[Error] Pipeline {name} stage failed:\n{traceback.format_exc()}")
+                return name, "" if name == "furigana" else f"{ai_engines.ERROR_PREFIX} {e}"
+
+        tasks = [asyncio.create_task(run_stage("translation", translate_final(text, profile_name, model_name, session)))]
+        draft_brain = await get_draft_brain()
+        if draft_brain is not None:
+            tasks.append(asyncio.create_task(run_stage(
+                "draft", translate_draft(draft_brain, text, profile_name, session))))
+        if want_furigana:
+            tasks.append(asyncio.create_task(run_stage("furigana", asyncio.to_thread(get_jap_furigana, text))))
+        try:
+            final_sent = False
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    name, result = task.result()
+                    if name == "draft" and (final_sent or not is_valid_translation(result)):
+                        continue
+                    if name in ("translation", "superseded"):
+                        final_sent = True
+                        # A draft that has not arrived yet is no longer useful
+                        if draft_brain is not None:
+                            tasks[1].cancel()
+                    yield name, {name: result}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    if data.get("stream"):
+        async def event_stream():
+            try:
+                async for event, payload in stages():
+                    yield format_sse(event, payload)
+            except Exception:
+                log(f"[Error] Pipeline Stream Error:\n{traceback.format_exc()}")
+            yield format_sse("done", {})
+        return StreamingResponse(event_stream(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    try:
+        result = {"roi": None, "text": "", "furigana": "", "draft": "", "translation": "", "superseded": False}
+        async for _, payload in stages():
+            result.update(payload)
+        return JSONResponse(result)
+    except Exception as e:
+        log(f"[Error] Pipeline Error:\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def warm_up_ai_engines():
+    """
+    Creates the engines this profile uses (ENGINE, plus the hedge and draft engines) off the event loop,
+    then pre-opens keep-alive connections so the first line is not slowed by SDK imports or TLS setup
+    """
+    names = [g_engine_name] + ([g_hedge_engine] if g_hedge_enabled else []) + ([g_draft_engine] if g_draft_enabled else [])
+    try:
+        for name in dict.fromkeys(names):
+            brain = await asyncio.to_thread(get_selected_brain, name)
+            await brain.warm_up()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        log(f"[Warning] AI engine warm-up failed: {e}")
+
+def schedule_ai_warm_up():
+    """Runs warm_up_ai_engines in the background: a slow or offline network must not hold up startup or /reload"""
+    global g_warm_up_task
+    if g_warm_up_task is not None and not g_warm_up_task.done():
+        g_warm_up_task.cancel()
+    g_warm_up_task = asyncio.create_task(warm_up_ai_engines())
+
+async def translate_latest(text, profile_name, model_name, session):
+    """
+    Translates through the request coalescer.
+    Raises request_coalescer.Superseded when the same session sends a different line first.
+    """
+    brain = await aget_selected_brain(g_engine_name)
+    # A new line makes the previous line's explanation prefetch pointless
+    cancel_explanation_prefetch()
+    key = (brain.ENGINE_NAME, profile_name, model_name or brain.DEFAULT_MODEL, normalize_source(text))
+    if g_hedge_enabled and g_hedge_engine != brain.ENGINE_NAME:
+        factory = lambda: hedged_translation(brain, text, profile_name, model_name)
+    else:
+        factory = lambda: brain.aget_translation(text, profile_name, model_name)
+    result = await g_translation_requests.run(session, key, factory)
+    if is_valid_translation(result):
+        schedule_explanation_prefetch(brain, text, model_name)
+    return result
+
+def cancel_explanation_prefetch():
+    global g_explain_prefetch_task
+    if g_explain_prefetch_task is not None and not g_explain_prefetch_task.done():
+        g_explain_prefetch_task.cancel()
+    g_explain_prefetch_task = None
+
+def schedule_explanation_prefetch(brain, text, model_name):
+    """Starts a speculative explanation of the translated line for Alt+F12 (EXPLAIN_PREFETCH)"""
+    global g_explain_prefetch_task
+    if not g_explain_prefetch_enabled:
+        return
+    cancel_explanation_prefetch()
+    # The overlay asks with the profile's engine and model, so the prefetched entry is the one it looks up
+    g_explain_prefetch_task = asyncio.create_task(prefetch_explanation(brain, text, model_name or brain.DEFAULT_MODEL))
+
+async def prefetch_explanation(brain, text, model_name):
+    """
+    Low priority: waits EXPLAIN_PREFETCH_DELAY, yields to any translation in flight, and stores the result
+    in the shared explanation cache. Cancelled as soon as the next line arrives; failures are only logged.
+    """
+    try:
+        await asyncio.sleep(EXPLAIN_PREFETCH_DELAY)
+        if g_translation_requests.get_stats()['in_flight']:
+            return
+        # Only spare quota: a prefetch never queues in front of translations
+        result = await brain.aget_explanation(text, model_name, low_priority=True)
+        if result is None:
+            log("[Prefetch] Skipped: engine is at its rate limit.")
+        elif isinstance(result, dict):
+            log(f"[Prefetch] Explanation ready for '{text[:30]}...'")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        log(f"[Prefetch] Explanation prefetch failed: {e}")
+
+async def get_draft_brain():
+    """Returns the draft engine when progressive refinement applies, otherwise None"""
+    if not g_draft_enabled:
+        return None
+    draft_brain = await aget_selected_brain(g_draft_engine)
+    return draft_brain if draft_brain.ENGINE_NAME != (await aget_selected_brain(g_engine_name)).ENGINE_NAME else None
+
+async def translate_draft(draft_brain, text, profile_name, session):
+    """
+    Draft translation through the request coalescer under its own session key, so a newer line
+    from the same session supersedes (and cancels) a stale draft just like the final translation.
+    """
+    key = ("draft", draft_brain.ENGINE_NAME, profile_name, g_draft_model or draft_brain.DEFAULT_MODEL, normalize_source(text))
+    factory = lambda: draft_brain.aget_translation(text, profile_name, g_draft_model, record_history=False)
+    return await g_translation_requests.run(f"{session}:draft", key, factory)
+
+def is_valid_translation(res):
+    return bool(res) and not res.startswith(ai_engines.ERROR_PREFIX)
+
+async def translate_final(text, profile_name, model_name, session):
+    """
+    Final (profile engine) translation behind a draft.
+    Drafts never enter history; the draft engine records the final line instead so its context stays aligned.
+    """
+    result = await translate_latest(text, profile_name, model_name, session)
+    draft_brain = await get_draft_brain()
+    if draft_brain is not None:
+        # Skipped when a hedge win by the same engine has already recorded this turn
+        draft_brain.record_history(text, result)
+    return result
+
+def register_final(task):
+    """Keeps a final-translation task fetchable by id; the oldest unclaimed ones are dropped"""
+    request_id = uuid.uuid4().hex[:12]
+    g_final_translations[request_id] = task
+    while len(g_final_translations) > MAX_PENDING_FINALS:
+        g_final_translations.popitem(last=False)
+    return request_id
+
+async def hedged_translation(brain, text, profile_name, model_name):
+    """Races the primary engine against HEDGE_ENGINE once the primary exceeds the hedge delay"""
+    secondary = await aget_selected_brain(g_hedge_engine)
+    delay = hedging.hedge_delay(brain.latency, g_hedge_delay_ms)
+    result, winner = await hedging.race_with_hedge(
+        lambda: brain.aget_translation(text, profile_name, model_name),
+        lambda: secondary.aget_translation(text, profile_name, g_hedge_model),
+        delay,
+        is_valid_translation
+    )
+    if winner == 1:
+        # Keep the primary's conversation context continuous even though it lost this line
+        brain.record_history(text, result)
+    return result
+
+def get_selected_brain(engine_name):
+    """Map engine instances based on INI configuration"""
+    return ai_engines.get_engine(engine_name)
+
+async def aget_selected_brain(engine_name):
+    """
+    get_selected_brain for the event loop. An engine not created yet is created in a worker thread:
+    creation imports its SDK and holds the registry's threading lock, which must not block the loop.
+    """
+    brain = ai_engines.loaded_engine(engine_name)
+    return brain if brain is not None else await asyncio.to_thread(get_selected_brain, engine_name)
+
+def format_sse(event, data):
+    # JSON keeps multi-line translations inside a single 'data:' field
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 # Translate with AI
 @app.post("/translate")
 async def translate(request: Request):
@@ -731,6 +1202,7 @@ async def translate(request: Request):
         text_to_translate = data.get("text", "")
         profile_name = data.get("profile", "Settings")
         model_name = data.get("model")
+        session = data.get("session", "default")
 
         if not text_to_translate: return PlainTextResponse("")
 
@@ -738,23 +1210,118 @@ async def translate(request: Request):
 
         log(f"[Translate] Request: '{text_to_translate[:30]}...' | Engine: {engine_name}")
 
-        # Map engine instances based on INI configuration
-        if engine_name == "ChatGPT":
-            selected_brain = ai_engines.chatgpt_brain
-        elif engine_name == "Local":
-            selected_brain = ai_engines.local_brain
-        else:
-            selected_brain = ai_engines.gemini_brain
-
-        # Offload blocking network I/O for translation to a separate thread
-        result = await asyncio.to_thread(selected_brain.get_translation, text_to_translate, profile_name, model_name)
-
-        return PlainTextResponse(result)
+        # Awaited on the event loop (async client + shared connection pool), no executor thread
+        try:
+            draft_brain = await get_draft_brain()
+            if draft_brain is None:
+                result = await translate_latest(text_to_translate, profile_name, model_name, session)
+                return PlainTextResponse(result)
+
+            # Progressive refinement: answer with the draft, the client fetches the final by id
+            final_task = asyncio.create_task(translate_final(text_to_translate, profile_name, model_name, session))
+            draft_task = asyncio.create_task(translate_draft(draft_brain, text_to_translate, profile_name, session))
+            draft_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            await asyncio.wait({final_task, draft_task}, return_when=asyncio.FIRST_COMPLETED)
+            if final_task.done() or draft_task.exception() is not None or not is_valid_translation(draft_task.result()):
+                # Final first (or superseded: 409 right away), or no usable draft: answer with the final
+                draft_task.cancel()
+                return PlainTextResponse(await final_task)
+            draft = draft_task.result()
+
+            final_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            log(f"[Draft] {draft_brain.ENGINE_NAME} draft ready. Final pending from {g_engine_name}.")
+            return PlainTextResponse(draft, headers={"X-Final-Id": register_final(final_task)})
+        except request_coalescer.Superseded:
+            # 409: a newer line from this session replaced this one; the client drops the result
+            return PlainTextResponse("", status_code=409)
 
     except Exception as e:
         log(f"[Error] Translation Pipeline Error:\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Final translation behind a draft returned by /translate (X-Final-Id header)
+@app.get("/translate/final/{request_id}")
+async def translate_final_result(request_id: str):
+    task = g_final_translations.pop(request_id, None)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired request id")
+    try:
+        # Shielded so a client timeout does not cancel the call (it still lands in history)
+        return PlainTextResponse(await asyncio.wait_for(asyncio.shield(task), FINAL_WAIT_TIMEOUT))
+    except request_coalescer.Superseded:
+        return PlainTextResponse("", status_code=409)
+    except asyncio.TimeoutError:
+        return PlainTextResponse("", status_code=504)
+
+# Word/sentence explanation for the study overlay (Alt+F12)
+@app.post("/explain")
+async def explain(request: Request):
+    """
+    Request: {"text", "engine" (defaults to the profile engine), "model"}.
+    Returns the parsed explanation JSON, served from the explanation cache when the line was seen before.
+    """
+    try:
+        data = await request.json()
+        text = data.get("text", "")
+        engine_name = data.get("engine") or g_engine_name
+        model_name = data.get("model") or None
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not text:
+        raise HTTPException(status_code=400, detail="Empty text")
+
+    log(f"[Explain] Request: '{text[:30]}...' | Engine: {engine_name}")
+    try:
+        # An engine other than the profile's may not exist yet; creating it imports its SDK
+        brain = await aget_selected_brain(engine_name)
+        result = await brain.aget_explanation(text, model_name)
+    except Exception as e:
+        log(f"[Error] Explanation Error:\n{traceback.format_exc()}")
+        raise HTTPException(status_code=502, detail=str(e))
+    if not isinstance(result, dict):
+        # Engine-side problems (missing API key) come back as a message instead of JSON
+        raise HTTPException(status_code=503, detail=str(result))
+    return JSONResponse(result)
+
+# Streaming translation (Server-Sent Events)
+@app.post("/translate_stream")
+async def translate_stream(request: Request):
+    """
+    Same request body as /translate. Emits 'delta' events ({"text": chunk}) as the model streams,
+    then one 'done' event ({"text": final}) with the post-filtered result, which replaces the deltas
+    (refusals, Local stop-phrase cleanup, translation memory hits).
+    """
+    try:
+        data = await request.json()
+        text_to_translate = data.get("text", "")
+        profile_name = data.get("profile", "Settings")
+        model_name = data.get("model")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    engine_name = g_engine_name
+    selected_brain = await aget_selected_brain(engine_name)
+    log(f"[Translate] Stream request: '{text_to_translate[:30]}...' | Engine: {engine_name}")
+
+    async def event_stream():
+        if not text_to_translate:
+            yield format_sse("done", {"text": ""})
+            return
+        cancel_explanation_prefetch()
+        try:
+            async for event, chunk in selected_brain.astream_translation(text_to_translate, profile_name, model_name):
+                if event == 'done' and is_valid_translation(chunk):
+                    schedule_explanation_prefetch(selected_brain, text_to_translate, model_name)
+                yield format_sse(event, {"text": chunk})
+        except Exception as e:
+            log(f"[Error] Translation Stream Error:\n{traceback.format_exc()}")
+            yield format_sse("done", {"text": f"{ai_engines.ERROR_PREFIX} {e}"})
+
+    # A client disconnect closes the generator, so an abandoned stream never reaches
+    # the history/translation memory bookkeeping.
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 def update_typical_h(new_h):
     """
     Updates character height using a Median Filter and a Verification Queue.
@@ -6,20 +6,17 @@ import ctypes
 import struct
 import re
 import time
+import httpx
 from urllib.parse import unquote
 from ctypes import wintypes
 from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QTextBrowser, QPushButton, QLabel, QSizeGrip
 from PySide6.QtCore import Qt, QPoint, QTimer, QThread, Signal, QEvent, QUrl
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
-import ai_engines
 import path_util
 
-# Maps engine names to shared AI engine instances
-ENGINE_MAP = {
-    "ChatGPT": ai_engines.chatgpt_brain,
-    "Gemini": ai_engines.gemini_brain,
-    "Local": ai_engines.local_brain
-}
+# Explanations run on the OCR server, which keeps the engines, connection pools and caches warm
+EXPLAIN_ENDPOINT = "http://127.0.0.1:5000/explain"
+EXPLAIN_TIMEOUT = 60.0
 
 # Windows Message constant for inter-process communication
 WM_COPYDATA = 0x004A
@@ -90,17 +87,24 @@ class AIWorker(QThread):
     finished = Signal(dict)
     error = Signal(str)
 
-    def __init__(self, engine_obj, text, model_name):
+    def __init__(self, engine_name, text, model_name):
         super().__init__()
-        self.engine_obj = engine_obj
+        self.engine_name = engine_name
         self.text = text
         self.model_name = model_name
 
     def run(self):
         try:
-            # Calls the explanation method of the selected engine (Gemini/GPT/Local)
-            result = self.engine_obj.get_explanation(self.text, self.model_name)
-            self.finished.emit(result)
+            # The server answers repeat lookups from its explanation cache without calling the engine
+            response = httpx.post(EXPLAIN_ENDPOINT, timeout=EXPLAIN_TIMEOUT, json={
+                "text": self.text, "engine": self.engine_name, "model": self.model_name
+            })
+            if response.status_code != 200:
+                self.error.emit(response.json().get("detail", response.text))
+                return
+            self.finished.emit(response.json())
+        except httpx.ConnectError:
+            self.error.emit("KO Trans server is not running (127.0.0.1:5000).")
         except Exception as e:
             self.error.emit(str(e))
 
@@ -396,11 +400,6 @@ class StudyOverlay(QWidget):
             self.worker.terminate()
             self.worker.wait()
 
-        selected_engine = ENGINE_MAP.get(engine_name, ai_engines.gemini_brain)
-
-        if hasattr(selected_engine, 'reload_settings'):
-            selected_engine.reload_settings()
-
         log(f"[AI] Starting task - Engine: {engine_name} | Model: {model_name}")
         self.text_area.setHtml(f"<i style='color: #00d4ff;'>[{engine_name}] Analyzing with {model_name}...</i>")
 
@@ -410,7 +409,7 @@ class StudyOverlay(QWidget):
         self.loading_label.show()
         self.loading_label.raise_()
 
-        self.worker = AIWorker(selected_engine, input_text, model_name)
+        self.worker = AIWorker(engine_name, input_text, model_name)
         self.worker.finished.connect(self.on_ai_success)
         self.worker.error.connect(self.on_ai_error)
         self.worker.start()
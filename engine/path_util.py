@@ -10,6 +10,8 @@ else:
 
 INI_PATH = os.path.join(ROOT_DIR, "settings.ini")
 VOICE_DIR = os.path.join(ROOT_DIR, "voice")
+CACHE_DIR = os.path.join(ROOT_DIR, "cache")
 
 PROMPT_PATH = os.path.join(ENGINE_DIR, "english_helper_prompt.txt")
-CRAFT_MODEL_PATH = os.path.join(ENGINE_DIR, "craft.onnx")
\ No newline at end of file
+CRAFT_MODEL_PATH = os.path.join(ENGINE_DIR, "craft.onnx")
+TM_DB_PATH = os.path.join(CACHE_DIR, "translation_memory.db")
\ No newline at end of file
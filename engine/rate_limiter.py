@@ -0,0 +1,158 @@
+import re
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from logger_util import log
+
+# Statuses worth retrying: quota (429) and transient server errors
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Gemini reports the quota reset in the error details ("retryDelay": "17s") instead of a header
+RETRY_DELAY_PATTERN = re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s")
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 20.0
+# How often queued (non-head) requests re-check their place in line
+QUEUE_POLL_INTERVAL = 0.05
+
+class RateLimitDropped(Exception):
+    """Raised to the oldest queued request when newer ones overflow the queue"""
+
+class TokenBucket:
+    """Refills 'per_minute' units evenly over a minute; holds at most one minute's worth"""
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A single request larger than the bucket only has to wait for a full bucket
+        need = min(amount, self.capacity)
+        return 0.0 if self.tokens >= need else (need - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+class RateLimiter:
+    """
+    Per-engine request scheduler for the configured RPM/TPM limits (0 = unlimited).
+    Async requests wait in FIFO order; when more than max_queue are waiting, the oldest one is dropped,
+    since a newer line has replaced it on screen. A 429 pauses the whole engine for the Retry-After delay.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.rpm = 0
+        self.tpm = 0
+        self.max_queue = 4
+        self._requests = None
+        self._tokens = None
+        self._blocked_until = 0.0
+        # Futures of waiting requests, oldest first; a future is resolved when its request is dropped
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self.stats = {'throttled': 0, 'dropped': 0, 'retries': 0, 'rate_limited': 0}
+
+    def configure(self, rpm=0, tpm=0, max_queue=4):
+        with self._lock:
+            if (rpm, tpm) != (self.rpm, self.tpm):
+                self.rpm, self.tpm = max(0, rpm), max(0, tpm)
+                self._requests = TokenBucket(self.rpm) if self.rpm else None
+                self._tokens = TokenBucket(self.tpm) if self.tpm else None
+            self.max_queue = max(1, max_queue)
+
+    def _reserve(self, tokens):
+        """Takes capacity when available now; otherwise returns the seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._blocked_until - now)
+            if self._requests is not None:
+                wait = max(wait, self._requests.wait_time(1, now))
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.wait_time(tokens, now))
+            if wait <= 0:
+                if self._requests is not None:
+                    self._requests.take(1)
+                if self._tokens is not None:
+                    self._tokens.take(tokens)
+            return wait
+
+    async def acquire(self, tokens):
+        """Waits for a request slot with 'tokens' estimated tokens. Raises RateLimitDropped when pushed out."""
+        # Joining behind queued requests keeps FIFO order even when capacity frees up meanwhile
+        if not self._queue and self._reserve(tokens) <= 0:
+            return
+        self.stats['throttled'] += 1
+        ticket = asyncio.get_running_loop().create_future()
+        self._queue.append(ticket)
+        if len(self._queue) > self.max_queue:
+            # Wakes the dropped request right away, even while it sleeps as the head of the queue
+            self._queue.popleft().set_result(True)
+        try:
+            while True:
+                if ticket.done():
+                    self.stats['dropped'] += 1
+                    log(f"[RateLimit] {self.name}: queue full, dropped the oldest waiting line.")
+                    raise RateLimitDropped()
+                if self._queue[0] is ticket:
+                    wait = self._reserve(tokens)
+                    if wait <= 0:
+                        return
+                else:
+                    wait = QUEUE_POLL_INTERVAL
+                await asyncio.wait({ticket}, timeout=wait)
+        finally:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+
+    def try_acquire(self, tokens):
+        """Takes capacity only if it is free right now and nobody is queued (for low-priority work)"""
+        return not self._queue and self._reserve(tokens) <= 0
+
+    def pause(self, seconds):
+        """Holds every request of this engine back, e.g. for a 429's Retry-After"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats.update({
+            'rpm': self.rpm,
+            'tpm': self.tpm,
+            'queue_depth': len(self._queue),
+            'paused_s': round(max(0.0, self._blocked_until - time.monotonic()), 1)
+        })
+        return stats
+
+def error_status(e):
+    """HTTP status of a provider exception (OpenAI, google-genai, Ollama), or None"""
+    for attr in ('status_code', 'code'):
+        value = getattr(e, attr, None)
+        if isinstance(value, int):
+            return value
+    value = getattr(getattr(e, 'response', None), 'status_code', None)
+    return value if isinstance(value, int) else None
+
+def retry_after(e):
+    """Seconds the provider asked us to wait (Retry-After header or Gemini retryDelay), or None"""
+    headers = getattr(getattr(e, 'response', None), 'headers', None)
+    value = headers.get('retry-after') if headers is not None else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    match = RETRY_DELAY_PATTERN.search(str(e))
+    return float(match.group(1)) if match else None
+
+def backoff_delay(attempt, hint=None):
+    """Full-jitter exponential backoff; a provider hint is honored with a little jitter on top"""
+    if hint is not None:
+        return hint + random.uniform(0, BACKOFF_BASE)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
@@ -0,0 +1,76 @@
+import asyncio
+from logger_util import log
+
+class Superseded(Exception):
+    """Raised to a waiter whose session has sent a newer, different request"""
+
+class RequestCoalescer:
+    """
+    Tracks in-flight translation calls on the server's event loop.
+    - Identical concurrent requests (same key) share one upstream call.
+    - A newer request from the same session supersedes the older one: the old waiter gets Superseded,
+      and the upstream call is cancelled once no waiter needs it anymore. Engines only write history
+      after a call completes, so a cancelled call never lands in the conversation context.
+    """
+    def __init__(self):
+        # key -> [upstream task, waiter count]
+        self._inflight = {}
+        # session -> (key, futures of every waiter on that key, set when a newer request supersedes them)
+        self._sessions = {}
+        self.stats = {'requests': 0, 'coalesced': 0, 'superseded': 0, 'upstream_cancelled': 0}
+
+    async def run(self, session, key, factory):
+        """Returns the result of factory() for this key, sharing it with identical concurrent requests"""
+        self.stats['requests'] += 1
+        entry = self._inflight.get(key)
+        if entry is None:
+            entry = [asyncio.create_task(factory()), 0]
+            entry[0].add_done_callback(self._consume_exception)
+            self._inflight[key] = entry
+        else:
+            self.stats['coalesced'] += 1
+            log("[Coalesce] Joined an identical in-flight translation.")
+        entry[1] += 1
+
+        superseded = asyncio.get_running_loop().create_future()
+        current = self._sessions.get(session)
+        if current is None or current[0] != key:
+            if current is not None:
+                for waiter in current[1]:
+                    if not waiter.done():
+                        waiter.set_result(True)
+            # A repeat of the same line joins the session's waiters instead of replacing them
+            current = (key, set())
+            self._sessions[session] = current
+        current[1].add(superseded)
+
+        try:
+            done, _ = await asyncio.wait({entry[0], superseded}, return_when=asyncio.FIRST_COMPLETED)
+            if entry[0] in done:
+                return entry[0].result()
+            self.stats['superseded'] += 1
+            log(f"[Coalesce] Request superseded by a newer one from session '{session}'.")
+            raise Superseded()
+        finally:
+            current[1].discard(superseded)
+            if not current[1] and self._sessions.get(session) is current:
+                del self._sessions[session]
+            superseded.cancel()
+            entry[1] -= 1
+            if entry[1] == 0:
+                if not entry[0].done():
+                    entry[0].cancel()
+                    self.stats['upstream_cancelled'] += 1
+                if self._inflight.get(key) is entry:
+                    del self._inflight[key]
+
+    @staticmethod
+    def _consume_exception(task):
+        # Marks the exception as retrieved when every waiter left before the task failed
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['in_flight'] = len(self._inflight)
+        return stats
@@ -0,0 +1,316 @@
+import os
+import sys
+import mmap
+import time
+import errno
+import struct
+import asyncio
+import ctypes
+import tempfile
+import threading
+import numpy as np
+from logger_util import log
+
+# --- Ring Layout (must match WriteToSharedMemory in KO_Trans.ahk) ---
+# Global header (64 bytes): magic u32 | version u32 | slot_count u32 | reserved u32 | slot_capacity u64 | latest_seq u64
+# Slot header (64 bytes):   state u32 | width u32 | height u32 | stride u32 | seq u64 | timestamp f64 (ms)
+# Pixel data (BGRA, slot_capacity bytes) follows each slot header.
+RING_MAGIC = 0x52544F4B  # b'KOTR'
+RING_VERSION = 1
+HEADER_SIZE = 64
+SLOT_HEADER_SIZE = 64
+# Three 40 MB slots: the ring maps about 120 MB, where the former single-slot buffer mapped 40 MB
+DEFAULT_SLOT_COUNT = 3
+DEFAULT_SLOT_CAPACITY = 4000 * 2500 * 4
+
+# Slot states
+SLOT_FREE = 0
+SLOT_WRITING = 1
+SLOT_READY = 2
+SLOT_READING = 3
+
+GLOBAL_FMT = '<IIIIQQ'
+SLOT_FMT = '<IIIIQd'
+LATEST_SEQ_OFFSET = 24
+
+def ring_size(slot_count=DEFAULT_SLOT_COUNT, slot_capacity=DEFAULT_SLOT_CAPACITY):
+    return HEADER_SIZE + slot_count * (SLOT_HEADER_SIZE + slot_capacity)
+
+def open_shared_region(name, size):
+    """
+    Opens (or creates) the named shared memory region.
+    Windows uses the named file mapping shared with AHK; elsewhere a file-backed mmap
+    under /dev/shm (or the temp dir) stands in for the 'tagname' mapping so the ring can be tested.
+    """
+    if sys.platform == 'win32':
+        return mmap.mmap(-1, size, tagname=name)
+
+    path = _stand_in_path(name)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        return mmap.mmap(fd, size)
+    finally:
+        os.close(fd)
+
+def _stand_in_path(name):
+    base_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base_dir, name)
+
+def now_ms():
+    """Writer timestamp clock. On Windows this matches A_TickCount (GetTickCount64)."""
+    return time.monotonic() * 1000.0
+
+class ShmFrame:
+    """
+    Zero-copy view of a ready frame in the ring (BGRA, shape h x w x 4).
+    The slot stays reserved (SLOT_READING) while the view is in use, so the writer cannot
+    overwrite pixels that are still being read. Call release() (or use 'with') when done.
+    """
+    def __init__(self, ring, slot, pixels, seq, timestamp):
+        self.ring = ring
+        self.slot = slot
+        self.pixels = pixels
+        self.seq = seq
+        self.timestamp = timestamp
+
+    def release(self):
+        if self.pixels is not None:
+            self.pixels = None
+            self.ring._set_state(self.slot, SLOT_FREE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+class ShmFrameRing:
+    """
+    Multi-slot frame ring with per-slot sequence numbers.
+    The capture side keeps writing into free slots while the server processes another one;
+    the reader always takes the newest complete frame and drops older unread ones.
+    """
+    def __init__(self, buf, slot_count, slot_capacity):
+        self.buf = buf
+        self.slot_count = slot_count
+        self.slot_capacity = slot_capacity
+        self.last_seq = 0
+
+    @classmethod
+    def open(cls, name, slot_count=DEFAULT_SLOT_COUNT, slot_capacity=DEFAULT_SLOT_CAPACITY):
+        buf = open_shared_region(name, ring_size(slot_count, slot_capacity))
+        magic, version, count, _, capacity, _ = struct.unpack_from(GLOBAL_FMT, buf, 0)
+        if magic != RING_MAGIC or version != RING_VERSION or count != slot_count or capacity != slot_capacity:
+            # First user of the mapping lays out the headers
+            buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+            for slot in range(slot_count):
+                base = cls._slot_base(slot, slot_capacity)
+                buf[base:base + SLOT_HEADER_SIZE] = bytes(SLOT_HEADER_SIZE)
+            struct.pack_into(GLOBAL_FMT, buf, 0, RING_MAGIC, RING_VERSION, slot_count, 0, slot_capacity, 0)
+            log(f"[SHM] Frame ring initialized: {slot_count} slots x {slot_capacity // (1024 * 1024)} MB")
+        else:
+            # AHK keeps the mapping alive across server restarts. The server is the only reader,
+            # so a slot still marked READING was left by a crashed server and is free again.
+            for slot in range(slot_count):
+                base = cls._slot_base(slot, slot_capacity)
+                if struct.unpack_from('<I', buf, base)[0] == SLOT_READING:
+                    struct.pack_into('<I', buf, base, SLOT_FREE)
+                    log(f"[SHM] Released slot {slot} left in READING state.")
+        return cls(buf, slot_count, slot_capacity)
+
+    @staticmethod
+    def _slot_base(slot, slot_capacity):
+        return HEADER_SIZE + slot * (SLOT_HEADER_SIZE + slot_capacity)
+
+    def _read_slot(self, slot):
+        return struct.unpack_from(SLOT_FMT, self.buf, self._slot_base(slot, self.slot_capacity))
+
+    def _set_state(self, slot, state):
+        struct.pack_into('<I', self.buf, self._slot_base(slot, self.slot_capacity), state)
+
+    def latest_seq(self):
+        return struct.unpack_from('<Q', self.buf, LATEST_SEQ_OFFSET)[0]
+
+    def has_unread_frame(self):
+        return self.latest_seq() > self.last_seq
+
+    def acquire_latest(self):
+        """Reserves and returns the newest unread frame, or None. Older unread frames are dropped."""
+        newest, newest_slot = None, -1
+        ready = []
+        for slot in range(self.slot_count):
+            state, w, h, stride, seq, ts = self._read_slot(slot)
+            if state == SLOT_READY and seq > self.last_seq:
+                ready.append(slot)
+                if newest is None or seq > newest[4]:
+                    newest, newest_slot = (state, w, h, stride, seq, ts), slot
+        if newest is None:
+            return None
+
+        _, w, h, stride, seq, ts = newest
+        self._set_state(newest_slot, SLOT_READING)
+        dropped = [s for s in ready if s != newest_slot]
+        for slot in dropped:
+            self._set_state(slot, SLOT_FREE)
+        if dropped:
+            log(f"[SHM] Dropped {len(dropped)} stale frame(s). Taking seq {seq}.")
+        self.last_seq = seq
+
+        stride = stride or w * 4
+        if w <= 0 or h <= 0 or stride < w * 4 or stride * h > self.slot_capacity:
+            log(f"[SHM] ⚠️ Invalid frame header: {w}x{h} stride {stride}")
+            self._set_state(newest_slot, SLOT_FREE)
+            return None
+
+        offset = self._slot_base(newest_slot, self.slot_capacity) + SLOT_HEADER_SIZE
+        rows = np.frombuffer(self.buf, dtype=np.uint8, count=stride * h, offset=offset).reshape((h, stride))
+        # Drop row padding without copying when the writer's stride is wider than the image
+        pixels = rows[:, :w * 4].reshape((h, w, 4))
+        return ShmFrame(self, newest_slot, pixels, seq, ts)
+
+class FrameNotifier:
+    """
+    Reader side of the 'frame ready' signal, awaited on the asyncio loop instead of flag polling.
+    Windows: manual-reset named event (shared with AHK), waited by one dedicated thread that wakes
+    the loop with call_soon_threadsafe. Elsewhere: a named FIFO watched with add_reader.
+    Usage: clear(), check the ring, then wait() - a frame published after clear() is never missed.
+    A wake-up may be stale (signaled before clear()), so callers re-check the ring after wait().
+    """
+    def __init__(self, name):
+        self.name = name
+        self._handle = None
+        self._fd = None
+        self._keepalive_fd = None
+        self._event = None
+        # Windows: set by clear() so the waiter thread watches the event again after reporting a signal
+        self._rearm = threading.Event()
+        self._rearm.set()
+
+    def _ensure_open(self):
+        if sys.platform == 'win32':
+            if self._handle is None:
+                kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+                kernel32.CreateEventW.restype = ctypes.c_void_p
+                self._kernel32 = kernel32
+                # bManualReset=True: the waiter thread does not consume the signal, clear() does
+                self._handle = kernel32.CreateEventW(None, True, False, self.name)
+                if not self._handle:
+                    raise OSError(ctypes.get_last_error(), f"CreateEventW failed for {self.name}")
+                self._event = asyncio.Event()
+                loop = asyncio.get_running_loop()
+                threading.Thread(target=self._wait_thread, args=(loop,), name="shm-frame-signal", daemon=True).start()
+                log("[SHM] Frame signal: Windows event watched by a waiter thread.")
+            return
+
+        if self._fd is None:
+            path = _stand_in_path(self.name)
+            if not os.path.exists(path):
+                os.mkfifo(path, 0o600)
+            self._fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+            # Holding a write end keeps the FIFO from reporting EOF (and spinning) while no writer is attached
+            self._keepalive_fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            self._event = asyncio.Event()
+            asyncio.get_running_loop().add_reader(self._fd, self._event.set)
+            log("[SHM] Frame signal: FIFO watched by the event loop.")
+
+    def _wait_thread(self, loop):
+        """Blocks on the named event and reports each signal to the loop; waits for clear() before watching again"""
+        self._kernel32.WaitForSingleObject.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+        while True:
+            # The event stays signaled (manual reset) until clear(); watching it again before that would spin
+            self._rearm.wait()
+            self._rearm.clear()
+            # INFINITE: the thread is a daemon and only ever wakes for a published frame
+            self._kernel32.WaitForSingleObject(self._handle, 0xFFFFFFFF)
+            loop.call_soon_threadsafe(self._event.set)
+
+    def clear(self):
+        """Resets the signal. Call before checking the ring for a frame."""
+        self._ensure_open()
+        if sys.platform == 'win32':
+            self._kernel32.ResetEvent(ctypes.c_void_p(self._handle))
+            self._event.clear()
+            self._rearm.set()
+            return
+        try:
+            while os.read(self._fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        self._event.clear()
+
+    async def wait(self, timeout):
+        """Returns when a frame is signaled or the timeout (seconds) expires"""
+        self._ensure_open()
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+class FrameSignal:
+    """Writer side of the 'frame ready' signal (the AHK client calls SetEvent on the same name)"""
+    def __init__(self, name):
+        self.name = name
+        self._handle = None
+
+    def set(self):
+        if sys.platform == 'win32':
+            kernel32 = ctypes.WinDLL('kernel32')
+            if self._handle is None:
+                kernel32.CreateEventW.restype = ctypes.c_void_p
+                self._handle = kernel32.CreateEventW(None, True, False, self.name)
+            kernel32.SetEvent(ctypes.c_void_p(self._handle))
+            return
+        try:
+            fd = os.open(_stand_in_path(self.name), os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            # No FIFO or no reader attached yet: nobody is waiting, so there is nothing to wake
+            if e.errno in (errno.ENOENT, errno.ENXIO):
+                return
+            raise
+        try:
+            os.write(fd, b'\x01')
+        except BlockingIOError:
+            pass
+        finally:
+            os.close(fd)
+
+class ShmRingWriter:
+    """Python-side producer. Mirrors the AHK writer; used to feed the server off-Windows."""
+    def __init__(self, ring, signal=None):
+        self.ring = ring
+        self.signal = signal
+
+    def _pick_slot(self):
+        # Oldest slot that is neither being read nor holding the newest published frame
+        latest = self.ring.latest_seq()
+        best, best_seq = None, None
+        for slot in range(self.ring.slot_count):
+            state, _, _, _, seq, _ = self.ring._read_slot(slot)
+            if state == SLOT_READING or (state == SLOT_READY and seq == latest):
+                continue
+            if best is None or seq < best_seq:
+                best, best_seq = slot, seq
+        return best
+
+    def write_frame(self, bgra):
+        """Publishes an (h, w, 4) uint8 frame. Returns its sequence number, or 0 if no slot was free."""
+        h, w = bgra.shape[:2]
+        size = h * w * 4
+        slot = self._pick_slot()
+        if slot is None or size > self.ring.slot_capacity:
+            return 0
+
+        ring = self.ring
+        base = ring._slot_base(slot, ring.slot_capacity)
+        ring._set_state(slot, SLOT_WRITING)
+        ring.buf[base + SLOT_HEADER_SIZE:base + SLOT_HEADER_SIZE + size] = np.ascontiguousarray(bgra, dtype=np.uint8).tobytes()
+        seq = ring.latest_seq() + 1
+        struct.pack_into(SLOT_FMT, ring.buf, base, SLOT_WRITING, w, h, w * 4, seq, now_ms())
+        ring._set_state(slot, SLOT_READY)
+        struct.pack_into('<Q', ring.buf, LATEST_SEQ_OFFSET, seq)
+        if self.signal is not None:
+            self.signal.set()
+        return seq
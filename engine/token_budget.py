@@ -0,0 +1,31 @@
+import re
+
+# Kana, CJK ideographs, Hangul and full-width forms: each costs roughly one token (or part of one)
+CJK_PATTERN = re.compile(r'[　-ヿ㐀-䶿一-鿿가-힯豈-﫿＀-￯]')
+# Role markers and separators the provider adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text, cjk_tokens_per_char=1.0, chars_per_token=4.0):
+    """
+    Approximate token count without loading a tokenizer.
+    CJK text is counted per character, everything else by the provider's average characters per token.
+    """
+    if not text:
+        return 0
+    cjk = len(CJK_PATTERN.findall(text))
+    return int(cjk * cjk_tokens_per_char + (len(text) - cjk) / chars_per_token) + 1
+
+def split_to_budget(history, budget, count_tokens):
+    """
+    Splits alternating user/assistant history into (older, recent).
+    'recent' is the longest run of newest complete exchanges whose estimated size fits the budget.
+    """
+    used = 0
+    keep = len(history)
+    while keep >= 2:
+        cost = sum(count_tokens(e['content']) + MESSAGE_OVERHEAD_TOKENS for e in history[keep - 2:keep])
+        if used + cost > budget:
+            break
+        used += cost
+        keep -= 2
+    return history[:keep], history[keep:]
@@ -0,0 +1,354 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from logger_util import log
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def normalize_source(text):
+    """Normalizes OCR text so cosmetic differences (width, spacing) map to the same entry"""
+    text = unicodedata.normalize('NFKC', text or "")
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+def compact_source(text):
+    """Whitespace-free form used for fuzzy comparison, mirroring GetSimilarity on the AHK side"""
+    return WHITESPACE_PATTERN.sub('', text)
+
+# Glyphs OCR confuses with each other; a substitution inside one group never changes what a line says.
+# Anything else (五/三, 彼/彼女, a dropped か) is a different line and must not reuse a translation.
+OCR_CONFUSABLE_GROUPS = [
+    "力カ", "ー一-—―‐−", "口ロ", "工エ", "夕タ", "卜ト", "八ハ", "二ニ", "へヘ", "べベ", "ぺペ",
+    "0O〇", "1lI", "っつ", "ッツ", "ゃや", "ャヤ", "ゅゆ", "ュユ", "ょよ", "ョヨ",
+    "ぁあ", "ぃい", "ぅう", "ぇえ", "ぉお", "ァア", "ィイ", "ゥウ", "ェエ", "ォオ",
+]
+OCR_CANONICAL = {ch: group[0] for group in OCR_CONFUSABLE_GROUPS for ch in group}
+# Stray marks OCR adds or loses around glyphs (text borders, furigana specks); ignored entirely
+OCR_NOISE_CHARS = set("|丨'`´‘’\"・·.,、_~")
+
+def ocr_canonical(text):
+    """Compact form in which lines differing only by OCR confusions and stray marks are equal"""
+    return "".join(OCR_CANONICAL.get(ch, ch) for ch in compact_source(text) if ch not in OCR_NOISE_CHARS)
+
+def bounded_edit_distance(a, b, max_dist):
+    """Levenshtein distance that gives up (returns max_dist + 1) once every path exceeds max_dist"""
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    if len(a) < len(b):
+        a, b = b, a
+
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        curr = [i] + [0] * len(b)
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            curr[j] = min(prev[j] + 1, curr[j-1] + 1, prev[j-1] + (ca != cb))
+            if curr[j] < row_min:
+                row_min = curr[j]
+        if row_min > max_dist:
+            return max_dist + 1
+        prev = curr
+    return prev[-1]
+
+class FuzzyIndex:
+    """
+    Approximate-match index over cached source lines of a single scope.
+    Lines are grouped by their OCR-canonical form, so only OCR wobble (力/カ, ー/一, stray |) can match;
+    the edit distance between the raw lines then enforces the similarity limits.
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        # key -> (compact source, canonical source, translation)
+        self.entries = OrderedDict()
+        # canonical source -> set of keys
+        self.canonical = {}
+
+    def add(self, key, source, translation):
+        if key in self.entries:
+            self.remove(key)
+        compact = compact_source(source)
+        canonical = ocr_canonical(source)
+        self.entries[key] = (compact, canonical, translation)
+        if canonical:
+            self.canonical.setdefault(canonical, set()).add(key)
+        while len(self.entries) > self.max_entries:
+            self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self.canonical.get(entry[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.canonical[entry[1]]
+
+    def search(self, source, threshold, max_distance):
+        """Returns (key, translation, similarity) of the closest OCR variant within the limits, or None"""
+        compact = compact_source(source)
+        canonical = ocr_canonical(source)
+        if not canonical:
+            return None
+
+        best = None
+        for key in self.canonical.get(canonical, ()):
+            cand, _, translation = self.entries[key]
+            max_len = max(len(compact), len(cand))
+            # Similarity threshold caps how many edits are allowed for this length
+            allowed = min(max_distance, int(max_len * (1.0 - threshold) + 1e-9))
+            dist = bounded_edit_distance(compact, cand, allowed)
+            if dist > allowed:
+                continue
+            similarity = 1.0 - dist / max_len
+            if best is None or similarity > best[2]:
+                best = (key, translation, similarity)
+        return best
+
+def make_scope(profile, engine, model, dict_version):
+    """Builds the part of the key that isolates entries per profile, engine, model and dictionary"""
+    return f"{profile}|{engine}|{model}|{dict_version}"
+
+class TranslationMemory:
+    """
+    Disk-backed translation memory shared by all engines.
+    Entries live in SQLite and are keyed on normalized source text + scope.
+    A small in-process LRU sits in front of the database so hot lines never touch the disk.
+    """
+    EVICT_INTERVAL = 100
+
+    def __init__(self, db_path, max_entries=20000, max_age_days=30, hot_size=512):
+        self.db_path = db_path
+        self.enabled = True
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self.hot_size = hot_size
+
+        # Fuzzy matching limits (similarity as in the AHK GetSimilarity, plus an absolute edit cap)
+        self.fuzzy_enabled = True
+        self.fuzzy_threshold = 0.8
+        self.fuzzy_max_distance = 3
+        self.fuzzy_index_size = 5000
+        # scope -> FuzzyIndex, loaded lazily from disk on first near-match query
+        self._fuzzy = {}
+        self.stats = {'hits': 0, 'near_hits': 0, 'misses': 0}
+
+        self._conn = None
+        self._lock = threading.Lock()
+        # key -> (translation, created)
+        self._hot = OrderedDict()
+        # key -> last_used timestamp, flushed to disk in batches
+        self._touched = {}
+        self._puts_since_evict = 0
+
+    def configure(self, enabled=True, max_entries=20000, max_age_days=30,
+                  fuzzy_enabled=True, fuzzy_threshold=0.8, fuzzy_max_distance=3):
+        """Applies INI limits. Called by engines whenever the profile is reloaded."""
+        with self._lock:
+            self.enabled = enabled
+            self.max_entries = max(100, max_entries)
+            self.max_age = max(1, max_age_days) * 86400
+            self.fuzzy_enabled = fuzzy_enabled
+            self.fuzzy_threshold = min(1.0, max(0.5, fuzzy_threshold))
+            self.fuzzy_max_distance = max(0, fuzzy_max_distance)
+            if self._conn is not None:
+                self._evict()
+
+    def get_stats(self):
+        """Hit / near-hit / miss counters for tuning TM_FUZZY_THRESHOLD"""
+        with self._lock:
+            stats = dict(self.stats)
+        total = sum(stats.values())
+        stats['hit_rate'] = round((stats['hits'] + stats['near_hits']) / total, 3) if total else 0.0
+        stats['fuzzy_threshold'] = self.fuzzy_threshold
+        stats['fuzzy_max_distance'] = self.fuzzy_max_distance
+        return stats
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            # WAL keeps lookups from blocking on writes and avoids an fsync per commit
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, scope TEXT NOT NULL, source TEXT NOT NULL, "
+                "translation TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations(last_used)")
+            conn.commit()
+            self._conn = conn
+            self._evict()
+            count = conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            log(f"[TM] Translation memory opened: {count} entries ({self.db_path})")
+        return self._conn
+
+    @staticmethod
+    def _make_key(source, scope):
+        return hashlib.sha1(f"{scope}\x00{source}".encode('utf-8')).hexdigest()
+
+    def _remember_hot(self, key, translation, created):
+        self._hot[key] = (translation, created)
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_size:
+            self._hot.popitem(last=False)
+
+    def get(self, text, scope):
+        """Returns the stored translation or None. Never raises."""
+        if not self.enabled:
+            return None
+        source = normalize_source(text)
+        if not source:
+            return None
+
+        key = self._make_key(source, scope)
+        now = time.time()
+        with self._lock:
+            try:
+                hot = self._hot.get(key)
+                if hot is not None:
+                    translation, created = hot
+                    if now - created <= self.max_age:
+                        self._hot.move_to_end(key)
+                        self._touched[key] = now
+                        return translation
+                    del self._hot[key]
+
+                conn = self._connect()
+                row = conn.execute("SELECT translation, created FROM translations WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+
+                translation, created = row
+                if now - created > self.max_age:
+                    conn.execute("DELETE FROM translations WHERE key = ?", (key,))
+                    conn.commit()
+                    return None
+
+                self._touched[key] = now
+                self._remember_hot(key, translation, created)
+                return translation
+            except Exception as e:
+                log(f"[TM] Lookup failed: {e}")
+                return None
+
+    def find(self, text, scope):
+        """
+        Exact lookup followed by an approximate match over the same scope.
+        Returns (translation, kind) where kind is 'hit', 'near_hit' or 'miss'.
+        """
+        if not self.enabled:
+            return None, 'miss'
+
+        translation = self.get(text, scope)
+        if translation is not None:
+            self._count('hits')
+            return translation, 'hit'
+
+        if self.fuzzy_enabled and self.fuzzy_max_distance > 0:
+            source = normalize_source(text)
+            with self._lock:
+                try:
+                    match = self._get_fuzzy_index(scope).search(source, self.fuzzy_threshold, self.fuzzy_max_distance)
+                except Exception as e:
+                    log(f"[TM] Fuzzy lookup failed: {e}")
+                    match = None
+            if match is not None:
+                key, translation, similarity = match
+                self._count('near_hits')
+                log(f"[TM] Near hit (similarity {similarity:.2f}): '{source[:30]}...'")
+                # Only the matched entry is refreshed; the OCR variant itself is never stored as an exact entry
+                with self._lock:
+                    self._touched[key] = time.time()
+                return translation, 'near_hit'
+
+        self._count('misses')
+        return None, 'miss'
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _get_fuzzy_index(self, scope):
+        index = self._fuzzy.get(scope)
+        if index is None:
+            index = FuzzyIndex(self.fuzzy_index_size)
+            rows = self._connect().execute(
+                "SELECT key, source, translation FROM "
+                "(SELECT key, source, translation, last_used FROM translations WHERE scope = ? ORDER BY last_used DESC LIMIT ?) "
+                "ORDER BY last_used ASC",
+                (scope, self.fuzzy_index_size)
+            ).fetchall()
+            for key, source, translation in rows:
+                index.add(key, source, translation)
+            self._fuzzy[scope] = index
+        return index
+
+    def put(self, text, scope, translation):
+        """Stores a finished translation. Never raises."""
+        if not self.enabled:
+            return
+        source = normalize_source(text)
+        if not source or not translation:
+            return
+
+        key = self._make_key(source, scope)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO translations (key, scope, source, translation, created, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, scope, source, translation, now, now)
+                )
+                self._touched.pop(key, None)
+                self._flush_touched()
+                conn.commit()
+                self._remember_hot(key, translation, now)
+                if scope in self._fuzzy:
+                    self._fuzzy[scope].add(key, source, translation)
+
+                self._puts_since_evict += 1
+                if self._puts_since_evict >= self.EVICT_INTERVAL:
+                    self._evict()
+            except Exception as e:
+                log(f"[TM] Store failed: {e}")
+
+    def _flush_touched(self):
+        """Writes batched last_used updates from hits so LRU order survives restarts"""
+        if self._touched and self._conn is not None:
+            self._conn.executemany("UPDATE translations SET last_used = ? WHERE key = ?",
+                                   [(ts, key) for key, ts in self._touched.items()])
+            self._touched = {}
+
+    def _evict(self):
+        """Drops expired entries first, then the least recently used ones above the size limit"""
+        self._puts_since_evict = 0
+        conn = self._conn
+        if conn is None:
+            return
+        try:
+            self._flush_touched()
+            expired = conn.execute("DELETE FROM translations WHERE created < ?", (time.time() - self.max_age,)).rowcount
+            overflow = conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM translations WHERE key IN "
+                    "(SELECT key FROM translations ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,)
+                )
+            else:
+                overflow = 0
+            conn.commit()
+            if expired or overflow:
+                self._hot.clear()
+                self._fuzzy.clear()
+                log(f"[TM] Evicted {expired} expired and {overflow} least recently used entries.")
+        except Exception as e:
+            log(f"[TM] Eviction failed: {e}")
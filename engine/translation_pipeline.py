@@ -0,0 +1,28 @@
+class TranslationJob:
+    """One line moving through an engine's translation stages"""
+    def __init__(self, text, profile, model_name, record_history=True, on_delta=None):
+        self.text = text
+        self.profile = profile
+        self.model_name = model_name
+        # False for draft translations, which must not enter the conversation context
+        self.record_history = record_history
+        # Streaming jobs (astream_translation) receive each provider text chunk through this callback
+        self.on_delta = on_delta
+        # Set once a chunk has been delivered; a partly shown stream cannot be retried
+        self.streamed = False
+        # Translation memory scope, set by the memory stage
+        self.scope = None
+        # Which stage produced the result: 'memory' or 'provider'
+        self.source = None
+
+async def run_stages(stages, job):
+    """
+    Runs job through stages, outermost first. A stage is async (job, call_next) -> result
+    and may return early (cache hit) or post-process what call_next returns.
+    The last stage receives call_next=None and must produce the result itself.
+    """
+    async def call(index, current):
+        if index == len(stages) - 1:
+            return await stages[index](current, None)
+        return await stages[index](current, lambda next_job: call(index + 1, next_job))
+    return await call(0, job)